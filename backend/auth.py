@@ -159,3 +159,24 @@ def get_current_user(authorization: Optional[str] = Header(None)):
     except Exception as e:
         print(f"Token validation error: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Authentication failed: {str(e)}")
+
+
+def get_user_id(current_user: dict = Depends(get_current_user)) -> str:
+    """
+    FastAPI dependency returning just the authenticated user's id.
+    Raises HTTPException(401) if the verified user carries no id.
+    """
+    user_id = current_user.get("id") or current_user.get("sub")
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return user_id
+
+
+def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """
+    FastAPI dependency that only lets admins through.
+    Uses the role get_current_user already loaded; raises HTTPException(403) otherwise.
+    """
+    if current_user.get('role') != 'admin':
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
@@ -26,9 +26,12 @@ if project_root not in sys.path:
 from fastapi import FastAPI, Request, status, WebSocket, WebSocketDisconnect, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.staticfiles import StaticFiles
+from postgrest.exceptions import APIError as PostgrestAPIError
 from datetime import datetime
+from contextlib import asynccontextmanager
+import anyio.to_thread
 import logging
 import json
 
@@ -66,10 +69,25 @@ import json
 
 logger = logging.getLogger(__name__)
 
+# Sync route handlers (blocking Supabase calls) run on AnyIO's worker threads.
+# Its default cap of 40 queues requests under load while those threads just wait on the network.
+THREADPOOL_SIZE = int(os.getenv("BACKEND_THREADPOOL_SIZE", "100"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    print(f"✅ Request thread pool size: {THREADPOOL_SIZE}")
+    yield
+    await music.spotify_http.aclose()
+
+
 # OpenAPI configuration for Swagger UI auth
 app = FastAPI(
     title="BookYourShoot API",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     swagger_ui_parameters={
         "persistAuthorization": True
     }
@@ -145,9 +163,44 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": exc.errors(), "body": str(exc.body)[:500] if exc.body else None},
     )
 
+CORS_ORIGINS = ["http://localhost:3000", "http://localhost:3001"]
+
+# App-wide: routers that let errors propagate (complaints, equipment) rely on these two handlers;
+# routers that catch their own errors never reach them.
+# Database errors raised by the Supabase/PostgREST client are the caller's fault (bad id, constraint, filter).
+# The DB message names tables and constraints, so it is logged rather than returned.
+@app.exception_handler(PostgrestAPIError)
+async def postgrest_exception_handler(request: Request, exc: PostgrestAPIError):
+    logger.warning(f"Database error for {request.url.path}: {exc.code} {exc.message}")
+    return ORJSONResponse(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        content={"success": False, "error": "Invalid request"},
+    )
+
+# Anything else a handler didn't catch: logged with its traceback, but the client only gets
+# a generic message in the {"success": False, "error"} shape the routers return.
+# Starlette runs Exception handlers in ServerErrorMiddleware, outside CORSMiddleware, so the
+# CORS headers are added here or the browser hides the body from the frontend.
+@app.exception_handler(Exception)
+async def unhandled_exception_handler(request: Request, exc: Exception):
+    logger.exception(f"Unhandled error for {request.url.path}")
+    headers = {}
+    origin = request.headers.get("origin")
+    if origin in CORS_ORIGINS:
+        headers = {
+            "Access-Control-Allow-Origin": origin,
+            "Access-Control-Allow-Credentials": "true",
+            "Vary": "Origin",
+        }
+    return ORJSONResponse(
+        status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        content={"success": False, "error": "Internal server error"},
+        headers=headers,
+    )
+
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:3001"],
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -430,6 +483,8 @@ async def websocket_chat_endpoint(
                             .neq('user_id', user_id)\
                             .execute()
                         
+                        chat.invalidate_conversations_cache(user_id, *[p.get('user_id') for p in (participants.data or [])])
+                        
                         # Create notification for other participants (not the sender)
                         for participant in (participants.data or []):
                             other_user_id = participant.get('user_id')
@@ -540,6 +595,7 @@ async def websocket_chat_endpoint(
                         .update({'status': 'READ', 'read_at': read_time})\
                         .eq('id', message_id)\
                         .execute()
+                    chat.invalidate_conversations_cache(user_id)
                     
                     # Broadcast read status with all fields frontend expects
                     await connection_manager.broadcast_to_conversation(
@@ -770,6 +826,15 @@ if __name__ == "__main__":
     port = int(os.getenv("BACKEND_PORT", "8000"))
     host = os.getenv("BACKEND_HOST", "127.0.0.1")
     reload_enabled = os.getenv("BACKEND_RELOAD", "false").lower() == "true"
+    # Extra worker processes scale CPU-bound endpoints (CNIC OCR) across cores.
+    # WebSocket chat/voice state is per-process, so keep 1 unless running behind sticky sessions.
+    workers = int(os.getenv("BACKEND_WORKERS", "1"))
+    # Without Redis every worker keeps its own response cache, and invalidation only
+    # reaches the worker that handled the write (others serve stale lists until TTL)
+    if workers > 1 and not reload_enabled:
+        from backend.services.cache_service import response_cache
+        if not response_cache.is_shared:
+            raise SystemExit("❌ BACKEND_WORKERS > 1 requires REDIS_URL (and the redis package) for a shared response cache")
     
     print(f"\n🚀 Starting BookYourShoot Backend Server")
     print(f"   Host: {host}")
@@ -779,9 +844,12 @@ if __name__ == "__main__":
     print(f"   WebSocket Chat: ws://{host}:{port}/ws/chat")
     print(f"   WebSocket Voice: ws://{host}:{port}/ws/voice")
     print(f"   Auto Reload: {'ON' if reload_enabled else 'OFF'}")
+    print(f"   Workers: {workers}")
     print(f"\n   Press CTRL+C to quit\n")
 
     if reload_enabled:
         uvicorn.run("backend.main:app", host=host, port=port, reload=True)
+    elif workers > 1:
+        uvicorn.run("backend.main:app", host=host, port=port, workers=workers)
     else:
         uvicorn.run(app, host=host, port=port, reload=False)
@@ -0,0 +1,45 @@
+-- Migration: Add Chat Query Functions and Indexes
+-- Date: 2026-10-18
+-- Purpose: Define the typed get_user_conversations RPC used by GET /api/chat/conversations
+--          so Postgres can cache one plan instead of the router falling back to ad-hoc queries
+
+-- 1. One page of a user's conversation list
+--    (called via supabase.rpc('get_user_conversations', {'p_user_id': ..., 'p_limit': ..., 'p_cursor': ...}))
+--    Drop the old unpaginated signature so the call can't resolve to it
+DROP FUNCTION IF EXISTS get_user_conversations(uuid);
+
+CREATE OR REPLACE FUNCTION get_user_conversations(
+    p_user_id uuid,
+    p_limit int DEFAULT 20,
+    p_cursor timestamptz DEFAULT NULL
+)
+RETURNS SETOF conversations
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT c.*
+    FROM conversations c
+    JOIN conversation_participants cp ON cp.conversation_id = c.id
+    WHERE cp.user_id = p_user_id
+      AND cp.is_banned = false
+      AND (p_cursor IS NULL OR c.updated_at < p_cursor)
+    ORDER BY c.updated_at DESC
+    LIMIT p_limit;
+$$;
+
+-- 2. Indexes backing the chat router's hot filters
+-- Participant lookups by user (conversation list) and by conversation + user (participant checks)
+CREATE INDEX IF NOT EXISTS idx_conversation_participants_user
+ON conversation_participants(user_id, conversation_id)
+WHERE is_banned = false;
+
+CREATE INDEX IF NOT EXISTS idx_conversation_participants_conversation_user
+ON conversation_participants(conversation_id, user_id);
+
+-- Message pages and unread counts: conversation_id + created_at with deleted rows excluded
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created
+ON messages(conversation_id, created_at DESC)
+WHERE is_deleted = false;
+
+-- Add comment for documentation
+COMMENT ON FUNCTION get_user_conversations(uuid, int, timestamptz) IS 'Conversations the user participates in (not banned), newest first, p_limit rows updated before p_cursor. Used by GET /api/chat/conversations.';
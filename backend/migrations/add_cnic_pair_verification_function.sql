@@ -0,0 +1,30 @@
+-- Migration: Add CNIC Pair Verification Function
+-- Date: 2026-10-18
+-- Purpose: Record a matched CNIC front/back verification and flag the user as verified
+--          in one round trip and one transaction (called from POST /api/cnic/verify-pair)
+
+-- 1. Insert the verification record and update the user's profile atomically
+CREATE OR REPLACE FUNCTION verify_cnic_pair(
+    p_user_id uuid,
+    p_upload_path text,
+    p_cnic text,
+    p_name text,
+    p_status text,
+    p_notes text
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO cnic_verification (user_id, upload_path, extracted_cnic, extracted_name, extracted_dob, status, notes)
+    VALUES (p_user_id, p_upload_path, p_cnic, p_name, NULL, p_status, p_notes);
+
+    UPDATE users
+    SET cnic_verified = true,
+        cnic_number = p_cnic
+    WHERE id = p_user_id;
+END;
+$$;
+
+-- Add comment for documentation
+COMMENT ON FUNCTION verify_cnic_pair(uuid, text, text, text, text, text) IS 'Saves a matched CNIC pair verification and marks the user CNIC-verified in one transaction. Used by POST /api/cnic/verify-pair.';
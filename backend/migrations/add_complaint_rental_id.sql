@@ -0,0 +1,23 @@
+-- Migration: Add Rental Reference to Complaints
+-- Date: 2026-10-18
+-- Purpose: Store the disputed rental on equipment rental complaints as a real column
+--          instead of embedding "Rental ID: ..." in the description text
+
+-- 1. Column + index
+ALTER TABLE complaints
+ADD COLUMN IF NOT EXISTS rental_id uuid REFERENCES equipment_rental(id);
+
+CREATE INDEX IF NOT EXISTS idx_complaints_rental
+ON complaints(rental_id)
+WHERE rental_id IS NOT NULL;
+
+-- 2. Backfill existing disputes from their "Rental ID: <uuid>" description line
+UPDATE complaints c
+SET rental_id = r.id
+FROM equipment_rental r
+WHERE c.category = 'equipment_rental'
+  AND c.rental_id IS NULL
+  AND r.id::text = substring(c.description FROM 'Rental ID: ([0-9a-fA-F-]{36})');
+
+-- create_rental_dispute (add_rental_dispute_functions.sql) records p_rental_id in this column,
+-- so this migration must run before that one (filename order already guarantees it)
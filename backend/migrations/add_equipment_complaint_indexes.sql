@@ -0,0 +1,26 @@
+-- Migration: Add Equipment and Complaint Indexes
+-- Date: 2026-10-18
+-- Purpose: Composite indexes matching the filter + sort chains used by the equipment
+--          and complaints routers so they stay index scans as the tables grow
+
+-- 1. Equipment
+-- GET /api/equipment/photographer/{id}: photographer_id + is_active, ordered by category
+CREATE INDEX IF NOT EXISTS idx_equipment_photographer_active
+ON equipment(photographer_id, is_active, category);
+
+-- GET /api/equipment/my-equipment: photographer_id, newest first
+CREATE INDEX IF NOT EXISTS idx_equipment_photographer_created
+ON equipment(photographer_id, created_at DESC);
+
+-- 2. Complaints
+-- GET /api/complaints/my-complaints: user_id, newest first
+CREATE INDEX IF NOT EXISTS idx_complaints_user_created
+ON complaints(user_id, created_at DESC);
+
+-- GET /api/complaints/ (admin): optional status filter, newest first, paginated
+CREATE INDEX IF NOT EXISTS idx_complaints_status_created
+ON complaints(status, created_at DESC);
+
+-- 3. Photographer profile lookup by owning user (get_photographer_id, equipment ownership joins)
+CREATE INDEX IF NOT EXISTS idx_photographer_profile_user
+ON photographer_profile(user_id);
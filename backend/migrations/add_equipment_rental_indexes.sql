@@ -0,0 +1,18 @@
+-- Migration: Add Equipment Rental Indexes
+-- Date: 2026-10-18
+-- Purpose: Back the rental conflict check, availability calendar and rental lists
+--          with indexes that match their filters and sort order
+
+-- 1. Overlap/conflict checks (create_rental_request, get_equipment_availability):
+--    equipment_id + open status + date range. Partial so closed rentals don't bloat it.
+CREATE INDEX IF NOT EXISTS idx_equipment_rental_conflict
+ON equipment_rental(equipment_id, status, start_date, end_date)
+WHERE status IN ('requested', 'approved', 'active');
+
+-- 2. GET /api/equipment/rentals/my: renter_id, newest first
+CREATE INDEX IF NOT EXISTS idx_equipment_rental_renter_created
+ON equipment_rental(renter_id, created_at DESC);
+
+-- 3. GET /api/equipment/rentals/owner: owner_id, newest first
+CREATE INDEX IF NOT EXISTS idx_equipment_rental_owner_created
+ON equipment_rental(owner_id, created_at DESC);
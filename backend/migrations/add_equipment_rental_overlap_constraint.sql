@@ -0,0 +1,48 @@
+-- Migration: Add Equipment Rental Overlap Constraint
+-- Date: 2026-10-18
+-- Purpose: Enforce "no two open rentals of the same equipment overlap" in Postgres so
+--          two concurrent POST /api/equipment/rentals can't both pass the router's
+--          conflict check and insert overlapping rentals (conflict = SQLSTATE 23P01)
+
+-- 1. btree_gist lets the exclusion constraint combine uuid equality with range overlap
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- 2. Refuse to run while open rentals overlap (or have end_date before start_date, which
+--    daterange() rejects). This migration never changes rental data: review and resolve the
+--    rows with backend/scripts/resolve_overlapping_equipment_rentals.sql, then re-run.
+DO $$
+DECLARE
+    conflicts int;
+BEGIN
+    SELECT count(*) INTO conflicts
+    FROM equipment_rental a
+    WHERE a.status IN ('requested', 'approved', 'active')
+      AND (
+        a.end_date < a.start_date
+        OR EXISTS (
+            SELECT 1
+            FROM equipment_rental b
+            WHERE b.equipment_id = a.equipment_id
+              AND b.id <> a.id
+              AND b.status IN ('requested', 'approved', 'active')
+              AND b.start_date <= a.end_date
+              AND b.end_date >= a.start_date
+        )
+      );
+
+    IF conflicts > 0 THEN
+        RAISE EXCEPTION 'equipment_rental has % open rental(s) that overlap another or have end_date < start_date', conflicts
+            USING HINT = 'Resolve them with backend/scripts/resolve_overlapping_equipment_rentals.sql before adding equipment_rental_no_overlap';
+    END IF;
+END;
+$$;
+
+-- 3. Open rentals (requested/approved/active) may not share a day for the same equipment.
+--    Dates are inclusive on both ends, matching the router's start_date..end_date semantics.
+ALTER TABLE equipment_rental
+ADD CONSTRAINT equipment_rental_no_overlap
+EXCLUDE USING gist (
+    equipment_id WITH =,
+    daterange(start_date, end_date, '[]') WITH &&
+)
+WHERE (status IN ('requested', 'approved', 'active'));
@@ -0,0 +1,29 @@
+-- Migration: Add equipment_rental updated_at Trigger
+-- Date: 2026-10-18
+-- Purpose: Let Postgres stamp equipment_rental.updated_at on every UPDATE so the
+--          equipment router no longer sends its own (client-clock) timestamps
+
+-- 1. Default for new rows
+ALTER TABLE equipment_rental
+ALTER COLUMN updated_at SET DEFAULT now();
+
+-- 2. Generic trigger function (reusable by other tables)
+CREATE OR REPLACE FUNCTION set_updated_at()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    NEW.updated_at = now();
+    RETURN NEW;
+END;
+$$;
+
+-- 3. Stamp every rental update
+DROP TRIGGER IF EXISTS trg_equipment_rental_updated_at ON equipment_rental;
+CREATE TRIGGER trg_equipment_rental_updated_at
+BEFORE UPDATE ON equipment_rental
+FOR EACH ROW
+EXECUTE FUNCTION set_updated_at();
+
+-- Add comment for documentation
+COMMENT ON FUNCTION set_updated_at() IS 'BEFORE UPDATE trigger function setting updated_at = now(). Used by equipment_rental.';
@@ -0,0 +1,64 @@
+-- Migration: Add Rental Dispute Functions
+-- Date: 2026-10-18
+-- Purpose: Write a rental dispute (complaint + rental note) and its resolution in one
+--          round trip and one transaction each (called from the equipment router)
+
+-- 1. Open a dispute: insert the complaint (with its rental_id) and flag the rental
+--    (called from POST /api/equipment/rentals/{rental_id}/dispute)
+--    Requires complaints.rental_id from add_complaint_rental_id.sql
+CREATE OR REPLACE FUNCTION create_rental_dispute(
+    p_user_id uuid,
+    p_photographer_id uuid,
+    p_subject text,
+    p_description text,
+    p_rental_id uuid,
+    p_rental_notes text
+)
+RETURNS SETOF complaints
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    INSERT INTO complaints (user_id, booking_id, photographer_id, rental_id, subject, description, category, priority, status)
+    VALUES (p_user_id, NULL, p_photographer_id, p_rental_id, p_subject, p_description, 'equipment_rental', 'high', 'open')
+    RETURNING *;
+
+    UPDATE equipment_rental
+    SET notes = p_rental_notes,
+        updated_at = now()
+    WHERE id = p_rental_id;
+END;
+$$;
+
+-- 2. Resolve a dispute: close the complaint and note the outcome on the rental (if known)
+--    (called from PUT /api/equipment/admin/disputes/{dispute_id}/resolve)
+CREATE OR REPLACE FUNCTION resolve_rental_dispute(
+    p_dispute_id uuid,
+    p_resolution text,
+    p_rental_id uuid,
+    p_rental_notes text
+)
+RETURNS SETOF complaints
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE complaints
+    SET status = 'resolved',
+        resolution = p_resolution,
+        resolved_at = now()
+    WHERE id = p_dispute_id
+    RETURNING *;
+
+    IF p_rental_id IS NOT NULL THEN
+        UPDATE equipment_rental
+        SET notes = p_rental_notes,
+            updated_at = now()
+        WHERE id = p_rental_id;
+    END IF;
+END;
+$$;
+
+-- Add comments for documentation
+COMMENT ON FUNCTION create_rental_dispute(uuid, uuid, text, text, uuid, text) IS 'Files an equipment rental dispute and notes it on the rental in one transaction. Used by POST /api/equipment/rentals/{rental_id}/dispute.';
+COMMENT ON FUNCTION resolve_rental_dispute(uuid, text, uuid, text) IS 'Resolves an equipment rental dispute and notes the outcome on the rental in one transaction. Used by PUT /api/equipment/admin/disputes/{dispute_id}/resolve.';
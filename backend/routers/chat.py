@@ -10,11 +10,49 @@ from datetime import datetime, timedelta
 from backend.supabase_client import supabase
 from backend.auth import get_current_user
 from backend.services.chat_websocket_manager import connection_manager
+from backend.services.cache_service import response_cache
 import logging
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 logger = logging.getLogger(__name__)
 
+# Conversation list cache (dashboards poll /conversations constantly)
+CONVERSATIONS_CACHE_TTL = 30  # seconds
+
+
+def conversations_cache_namespace(user_id: str) -> str:
+    return f"conv:{user_id}"
+
+
+def conversations_cache_key(user_id: str, limit: int, cursor: Optional[str]) -> str:
+    """
+    One key per page under the user's current list version
+
+    Read the version before querying: a write that lands mid-request bumps
+    it, so the stale page is stored under a key nobody reads again.
+    """
+    namespace = conversations_cache_namespace(user_id)
+    return f"{namespace}:v{response_cache.get_version(namespace)}:{limit}:{cursor or ''}"
+
+
+def invalidate_conversations_cache(*user_ids: str):
+    """Drop cached conversation lists for the given users"""
+    for uid in user_ids:
+        if uid:
+            response_cache.bump_version(conversations_cache_namespace(uid))
+
+
+def invalidate_conversation_participants_cache(conversation_id: str):
+    """Drop cached conversation lists for everyone in a conversation"""
+    try:
+        parts_resp = supabase.table('conversation_participants')\
+            .select('user_id')\
+            .eq('conversation_id', conversation_id)\
+            .execute()
+        invalidate_conversations_cache(*[p['user_id'] for p in (parts_resp.data or [])])
+    except Exception as e:
+        logger.warning(f"Failed to invalidate conversation cache for {conversation_id}: {e}")
+
 # ============================================
 # Request/Response Models
 # ============================================
@@ -114,6 +152,7 @@ def create_conversation(
             }
         ]
         supabase.table('conversation_participants').insert(participants).execute()
+        invalidate_conversations_cache(booking['client_id'], booking['photographer_id'])
         
         logger.info(f"✅ Created conversation {conversation_id} for booking {payload.booking_id}")
         
@@ -230,6 +269,7 @@ def create_direct_conversation(
         ]
         
         supabase.table('conversation_participants').insert(participants).execute()
+        invalidate_conversations_cache(user_id, target_id)
         
         logger.info(f"✅ Created direct conversation {conversation_id} between {user_id} and {target_id}")
         
@@ -282,9 +322,19 @@ def get_conversations(
     try:
         user_id = current_user.get("id")
         
+        # Serve from cache when this page was built recently
+        cache_key = conversations_cache_key(user_id, limit, cursor)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         # Use database function for efficiency
         try:
-            resp = supabase.rpc('get_user_conversations', {'p_user_id': user_id}).execute()
+            resp = supabase.rpc('get_user_conversations', {
+                'p_user_id': user_id,
+                'p_limit': limit,
+                'p_cursor': cursor
+            }).execute()
             conversations = resp.data if resp.data else []
         except Exception as rpc_error:
             logger.warning(f"RPC function not available, using fallback query: {rpc_error}")
@@ -301,22 +351,18 @@ def get_conversations(
                 return {"success": True, "data": [], "has_more": False, "next_cursor": None}
             
             # Get conversation details
-            conversations_resp = supabase.table('conversations')\
+            conversations_query = supabase.table('conversations')\
                 .select('*')\
-                .in_('id', conversation_ids)\
+                .in_('id', conversation_ids)
+            if cursor:
+                conversations_query = conversations_query.lt('updated_at', cursor)
+            conversations_resp = conversations_query\
                 .order('updated_at', desc=True)\
                 .limit(limit)\
                 .execute()
             
             conversations = conversations_resp.data if conversations_resp.data else []
         
-        # Apply cursor pagination if provided
-        if cursor:
-            conversations = [c for c in conversations if c.get('updated_at', '') < cursor]
-        
-        # Limit results
-        conversations = conversations[:limit]
-        
         # ENHANCEMENT: Add participants, other_user info, and unread count to each conversation
         for conv in conversations:
             try:
@@ -390,12 +436,15 @@ def get_conversations(
                 conv['other_user'] = None
                 conv['unread_count'] = 0
         
-        return {
+        result = {
             "success": True,
             "data": conversations,
             "has_more": len(conversations) == limit,
             "next_cursor": conversations[-1].get('updated_at') if conversations else None
         }
+        response_cache.set(cache_key, result, CONVERSATIONS_CACHE_TTL)
+        
+        return result
     
     except Exception as e:
         logger.error(f"Error fetching conversations: {e}")
@@ -452,6 +501,7 @@ def get_conversation_messages(
             .eq('conversation_id', conversation_id)\
             .eq('user_id', user_id)\
             .execute()
+        invalidate_conversations_cache(user_id)
         
         return {
             "success": True,
@@ -556,6 +606,8 @@ async def send_message_rest(
             .neq('user_id', user_id)\
             .execute()
         
+        invalidate_conversations_cache(user_id, *[p.get('user_id') for p in (participants.data or [])])
+        
         # Create notification for other participants
         for participant in (participants.data or []):
             other_user_id = participant.get('user_id')
@@ -717,6 +769,7 @@ def mark_message_read(message_id: str, current_user: dict = Depends(get_current_
             })\
             .eq('id', message_id)\
             .execute()
+        invalidate_conversations_cache(user_id)
         
         return {"success": True, "message": "Message marked as read"}
     
@@ -835,6 +888,8 @@ def admin_delete_message(
             })\
             .eq('id', message_id)\
             .execute()
+        # Cached conversation lists carry unread counts and previews for this message
+        invalidate_conversation_participants_cache(message['conversation_id'])
         
         # Log action
         admin_id = current_user.get("id")
@@ -893,6 +948,7 @@ def admin_ban_user_from_conversation(
             .eq('conversation_id', conversation_id)\
             .eq('user_id', user_id)\
             .execute()
+        invalidate_conversations_cache(user_id)
         
         # Log action
         supabase.table('chat_audit').insert({
@@ -939,6 +995,7 @@ def admin_unban_user_from_conversation(
             .eq('conversation_id', conversation_id)\
             .eq('user_id', user_id)\
             .execute()
+        invalidate_conversations_cache(user_id)
         
         # Log action
         supabase.table('chat_audit').insert({
@@ -1082,6 +1139,7 @@ async def log_voice_call(
             raise HTTPException(status_code=400, detail="Failed to create call log")
         
         new_message = resp.data[0]
+        invalidate_conversation_participants_cache(payload.conversation_id)
         
         logger.info(f"📞 Broadcasting new call log: {payload.call_status} to conversation {payload.conversation_id}")
         logger.info(f"📞 Message ID: {new_message.get('id')}, Content: {new_message.get('content')}")
@@ -9,9 +9,14 @@ Provides intelligent, context-aware responses based on:
 
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Dict, Deque
+from collections import deque
+from concurrent.futures import Future
+import hashlib
 import os
-import requests
+import threading
+import httpx
+import orjson
 from datetime import datetime
 from backend.supabase_client import supabase
 from backend.auth import get_current_user
@@ -22,11 +27,45 @@ router = APIRouter(prefix="/chatbot", tags=["AI Chatbot"])
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 GEMINI_MODEL = "gemini-2.5-flash"
 GEMINI_API_URL = f"https://generativelanguage.googleapis.com/v1beta/models/{GEMINI_MODEL}:generateContent"
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "20"))
+
+# Cap concurrent upstream calls to stay within Gemini's quota
+gemini_semaphore = threading.BoundedSemaphore(GEMINI_MAX_CONCURRENCY)
+# Identical prompts already in flight (e.g. double-clicks) share one upstream call
+inflight_requests: Dict[str, Future] = {}
+inflight_lock = threading.Lock()
+
+
+def create_gemini_client() -> httpx.Client:
+    """Shared keep-alive client for Gemini (HTTP/2 multiplexing when h2 is installed)"""
+    options = dict(
+        limits=httpx.Limits(max_keepalive_connections=32, max_connections=64, keepalive_expiry=60),
+        timeout=httpx.Timeout(30.0, connect=5.0)
+    )
+    try:
+        return httpx.Client(http2=True, **options)
+    except ImportError:
+        print("⚠️  h2 not installed - Gemini client falling back to HTTP/1.1")
+        return httpx.Client(**options)
+
+
+gemini_client = create_gemini_client()
 
 # In-memory conversation store (session-based, short-term memory)
 # In production, use Redis or DB for persistence
-conversation_memory = {}
+# Each session is a bounded deque, so old messages fall off in O(1)
+conversation_memory: Dict[str, Deque[dict]] = {}
 MAX_MEMORY_MESSAGES = 10  # Keep last 10 messages per session
+HISTORY_TOKEN_BUDGET = 2000  # Max (approx.) tokens of history injected into the prompt
+CHARS_PER_TOKEN = 4  # Rough chars-per-token ratio for English/Roman Urdu text
+
+
+# Active booking status -> chatbot booking stage
+ACTIVE_BOOKING_STAGES = {
+    "pending": "booked",
+    "confirmed": "confirmed",
+    "in_progress": "in_progress"
+}
 
 
 class ChatMessage(BaseModel):
@@ -72,21 +111,26 @@ def get_user_context(user_id: str) -> dict:
         # Get active bookings count and recent event types
         bookings = supabase.table('bookings').select('id, status, event_type').eq('client_id', user_id).order('created_at', desc=True).limit(5).execute()
         if bookings.data:
-            active = [b for b in bookings.data if b.get('status') in ['pending', 'confirmed', 'in_progress']]
-            context["active_bookings"] = len(active)
-            context["recent_event_types"] = list(set([b.get('event_type') for b in bookings.data if b.get('event_type')]))
+            # Single pass: count active bookings, find the latest active status,
+            # and collect event types (newest first, de-duplicated)
+            active_count = 0
+            latest_status = None
+            event_types = {}
+            for b in bookings.data:
+                status = b.get('status')
+                if status in ACTIVE_BOOKING_STAGES:
+                    active_count += 1
+                    if latest_status is None:
+                        latest_status = status
+                event_type = b.get('event_type')
+                if event_type:
+                    event_types[event_type] = None
+            
+            context["active_bookings"] = active_count
+            context["recent_event_types"] = list(event_types)
             
             # Determine booking stage from most recent
-            if active:
-                latest_status = active[0].get('status')
-                if latest_status == 'pending':
-                    context["booking_stage"] = "booked"
-                elif latest_status == 'confirmed':
-                    context["booking_stage"] = "confirmed"
-                elif latest_status == 'in_progress':
-                    context["booking_stage"] = "in_progress"
-            elif bookings.data:
-                context["booking_stage"] = "completed"
+            context["booking_stage"] = ACTIVE_BOOKING_STAGES[latest_status] if latest_status else "completed"
         
     except Exception as e:
         print(f"Error fetching user context: {e}")
@@ -269,24 +313,51 @@ When helping with booking, guide users through these steps:
 
 def get_conversation_history(session_id: str) -> List[dict]:
     """Get conversation history for a session"""
-    if session_id in conversation_memory:
-        return conversation_memory[session_id][-MAX_MEMORY_MESSAGES:]
-    return []
+    return list(conversation_memory.get(session_id, ()))
+
+
+def _session_memory(session_id: str) -> Deque[dict]:
+    """Get (or create) the bounded message buffer for a session"""
+    return conversation_memory.setdefault(session_id, deque(maxlen=MAX_MEMORY_MESSAGES))
 
 
 def save_to_memory(session_id: str, role: str, content: str):
     """Save message to conversation memory"""
-    if session_id not in conversation_memory:
-        conversation_memory[session_id] = []
-    
-    conversation_memory[session_id].append({
+    _session_memory(session_id).append({
         "role": role,
         "content": content
     })
-    
-    # Trim to max memory size
-    if len(conversation_memory[session_id]) > MAX_MEMORY_MESSAGES:
-        conversation_memory[session_id] = conversation_memory[session_id][-MAX_MEMORY_MESSAGES:]
+
+
+def save_turn(session_id: str, user_message: str, assistant_message: str):
+    """Save a full user/assistant exchange to conversation memory in one write"""
+    _session_memory(session_id).extend((
+        {"role": "user", "content": user_message},
+        {"role": "assistant", "content": assistant_message}
+    ))
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for prompt budgeting"""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def trim_history_to_budget(conversation: List[dict], budget: int = HISTORY_TOKEN_BUDGET) -> List[dict]:
+    """Keep the newest messages whose combined size fits within the token budget"""
+    kept = []
+    used = 0
+    for msg in reversed(conversation):
+        cost = estimate_tokens(msg["content"])
+        if used + cost > budget:
+            if not kept:
+                # Newest message alone is over budget - keep its tail so the bot still has context
+                max_chars = budget * CHARS_PER_TOKEN
+                kept.append({"role": msg["role"], "content": "..." + msg["content"][-max_chars:]})
+            break
+        kept.append(msg)
+        used += cost
+    kept.reverse()
+    return kept
 
 
 def call_gemini_api(system_prompt: str, conversation: List[dict], user_message: str) -> str:
@@ -297,31 +368,59 @@ def call_gemini_api(system_prompt: str, conversation: List[dict], user_message:
     
     # Build the full prompt with conversation history
     history_text = ""
-    if conversation:
+    history = trim_history_to_budget(conversation)
+    if history:
         history_text = "\n\n## Recent Conversation:\n"
-        for msg in conversation[-6:]:  # Last 6 messages
+        for msg in history:
             role_label = "User" if msg["role"] == "user" else "Assistant"
             history_text += f"{role_label}: {msg['content']}\n"
     
     full_prompt = f"{system_prompt}{history_text}\n\n## Current User Message:\n{user_message}\n\n## Your Response:"
     
+    # Coalesce with an identical request that is already waiting on Gemini
+    prompt_key = hashlib.blake2b(full_prompt.encode("utf-8"), digest_size=16).hexdigest()
+    with inflight_lock:
+        future = inflight_requests.get(prompt_key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            inflight_requests[prompt_key] = future
+    
+    if not is_owner:
+        return future.result()
+    
+    try:
+        with gemini_semaphore:
+            response_text = post_to_gemini(full_prompt)
+        future.set_result(response_text)
+        return response_text
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with inflight_lock:
+            inflight_requests.pop(prompt_key, None)
+
+
+def post_to_gemini(full_prompt: str) -> str:
+    """Send a single prompt to Gemini and return the response text"""
     try:
-        response = requests.post(
-            f"{GEMINI_API_URL}?key={GEMINI_API_KEY}",
+        response = gemini_client.post(
+            GEMINI_API_URL,
+            params={"key": GEMINI_API_KEY},
             headers={"Content-Type": "application/json"},
-            json={
+            content=orjson.dumps({
                 "contents": [{"parts": [{"text": full_prompt}]}],
                 "generationConfig": {
                     "temperature": 0.7,
                     "maxOutputTokens": 1500,
                     "topP": 0.9
                 }
-            },
-            timeout=30
+            })
         )
         
         if response.status_code == 200:
-            data = response.json()
+            data = orjson.loads(response.content)
             if "candidates" in data and len(data["candidates"]) > 0:
                 return data["candidates"][0]["content"]["parts"][0]["text"]
             return "I couldn't generate a response. Please try again."
@@ -329,7 +428,7 @@ def call_gemini_api(system_prompt: str, conversation: List[dict], user_message:
             print(f"Gemini API error: {response.status_code} - {response.text}")
             return "I'm having trouble connecting to my brain right now. Please try again in a moment."
             
-    except requests.exceptions.Timeout:
+    except httpx.TimeoutException:
         return "The response is taking too long. Please try again."
     except Exception as e:
         print(f"Gemini API exception: {e}")
@@ -373,8 +472,7 @@ def ask_chatbot(payload: ChatRequest, current_user: dict = Depends(get_current_u
         response_text = call_gemini_api(system_prompt, conversation, payload.message)
         
         # Save to memory
-        save_to_memory(session_id, "user", payload.message)
-        save_to_memory(session_id, "assistant", response_text)
+        save_turn(session_id, payload.message, response_text)
         
         return ChatResponse(
             response=response_text,
@@ -414,8 +512,7 @@ def ask_chatbot_public(payload: ChatRequest):
         conversation = get_conversation_history(session_id)
         response_text = call_gemini_api(system_prompt, conversation, payload.message)
         
-        save_to_memory(session_id, "user", payload.message)
-        save_to_memory(session_id, "assistant", response_text)
+        save_turn(session_id, payload.message, response_text)
         
         return {
             "response": response_text,
@@ -489,6 +586,14 @@ def clear_conversation_memory(session_id: str):
     return {"success": True, "message": "No memory found for this session"}
 
 
+def get_gemini_pool_connections() -> Optional[int]:
+    """Open upstream connections in the Gemini client pool (for monitoring)"""
+    try:
+        return len(gemini_client._transport._pool.connections)
+    except AttributeError:
+        return None
+
+
 @router.get("/health")
 def chatbot_health():
     """Check chatbot service health"""
@@ -496,5 +601,6 @@ def chatbot_health():
         "status": "ok",
         "gemini_configured": bool(GEMINI_API_KEY),
         "model": GEMINI_MODEL,
-        "active_sessions": len(conversation_memory)
+        "active_sessions": len(conversation_memory),
+        "gemini_pool_connections": get_gemini_pool_connections()
     }
@@ -1,19 +1,46 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, BackgroundTasks
 from backend.supabase_client import supabase
 from backend.auth import get_current_user
+from backend.services.cache_service import response_cache
 from datetime import datetime
+from functools import cached_property, lru_cache
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from bisect import bisect_right
+import asyncio
+import hashlib
+import io
+import queue
+import os
+import threading
 import cv2
 import numpy as np
 import pytesseract
 import re
-from typing import Optional, List, Dict, Any, Tuple, cast
+from typing import Optional, List, Dict, Any, Tuple, Iterator, cast
 from pydantic import BaseModel
+# Keep Tesseract's OpenMP single-threaded: concurrent requests (and OCR_SCALES) already
+# parallelize across cores, and per-call OpenMP threads only oversubscribe them.
+# Must be set before libtesseract is loaded (tesserocr import / first pytesseract call).
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
 try:
     from pyzbar import pyzbar as pyzbar_mod
     PYZBAR_AVAILABLE = True
 except ImportError:
     pyzbar_mod = None
     PYZBAR_AVAILABLE = False
+from PIL import Image
+# WeChat's CNN QR detector ships with opencv-contrib-python only
+WECHAT_QR_AVAILABLE = hasattr(cv2, "wechat_qrcode")
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    tesserocr = None
+    TESSEROCR_AVAILABLE = False
 
 router = APIRouter(prefix="/cnic", tags=["CNIC Verification"])
 
@@ -23,31 +50,435 @@ try:
 except:
     pass  # Will use system PATH if available
 
+# Accepted uploads; the bytes themselves are validated again when decoded
+ALLOWED_EXTENSIONS = frozenset({"jpg", "jpeg", "png"})
+ALLOWED_CONTENT_TYPES = frozenset({"image/jpeg", "image/jpg", "image/png"})
+# Clients that don't know the type send one of these; the extension decides then
+UNTYPED_CONTENT_TYPES = frozenset({"", "application/octet-stream"})
+
+# Upload limits: reject oversized files before reading them fully or decoding
+MAX_UPLOAD_BYTES = 8 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# Photos larger than this on the long side are decoded at half scale by libjpeg
+REDUCED_DECODE_MIN_SIDE = 3000
+# OCR/QR accuracy doesn't improve past this; everything downstream scales with pixel count
+MAX_IMAGE_SIDE = 1800
+
+# Margin (px) kept around each candidate QR region when cropping for decode
+QR_CROP_MARGIN = 20
+# Variants tried by both decoders side by side before falling back to the rest
+QR_PRIORITY_VARIANTS = 3
+_qr_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cnic-qr")
+
+# Tesseract runs as a subprocess (releases the GIL), so OCR passes at
+# different scales can run side by side
+OCR_SCALES = (1.0, 1.5, 2.0)
+_ocr_executor = ThreadPoolExecutor(max_workers=len(OCR_SCALES), thread_name_prefix="cnic-ocr")
+
+# Character whitelist for the CNIC number pass (shrinks Tesseract's search space)
+CNIC_DIGIT_WHITELIST = "0123456789- "
+# OCR often splits a CNIC number across words; allow a match to span this many
+CNIC_WINDOW_MAX_WORDS = 5
+# A window scoring this high (avg confidence + 5 per word) at scale 1.0 is trusted
+# without OCR'ing the upscaled copies
+CNIC_EARLY_EXIT_SCORE = 90
+
+# tesserocr keeps the engine loaded in-process (no subprocess + PNG round trip per call).
+# PyTessBaseAPI is not thread-safe and each engine holds its own language data (tens of MB),
+# so a small fixed pool is shared by every thread; callers borrow one per OCR call and
+# wait when all are busy. Enough for one request's concurrent scales plus one more.
+TESS_ENGINE_POOL_SIZE = len(OCR_SCALES) + 1
+_tess_pool: "queue.LifoQueue[Any]" = queue.LifoQueue()
+_tess_pool_created = 0
+_tess_pool_lock = threading.Lock()
+
+# OCR results keyed by (upload content hash, source image, config). Decoding and
+# preprocessing are deterministic, so re-uploads of the same photo (e.g. /verify
+# followed by /verify-pair) skip Tesseract entirely. Bounded LRU shared by all requests.
+OCR_CACHE_SIZE = 256
+# OCR text is ID-card PII, so sharing it through Redis (across workers, so a retried upload
+# skips OCR) is opt-in and short-lived: just long enough to cover a retry or /verify-pair.
+OCR_SHARED_CACHE_ENABLED = os.getenv("CNIC_OCR_SHARED_CACHE", "false").lower() == "true"
+OCR_SHARED_CACHE_TTL = 10 * 60
+_ocr_results: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+_ocr_results_lock = threading.Lock()
+
+
+# Haar face cascade for the front-side photo check (XML parsed once at import)
+_cv2_data = getattr(cv2, "data", None)
+_HAAR_DIR = getattr(_cv2_data, "haarcascades", "") if _cv2_data else ""
+_FACE_CASCADE = cv2.CascadeClassifier(_HAAR_DIR + "haarcascade_frontalface_default.xml") if _HAAR_DIR else None
+FACE_DETECT_MAX_SIDE = 640  # Face detection cost grows with pixel count; CNIC photo is large enough at this size
+
+
+# CNIC number / date patterns
+_NON_DIGIT = re.compile(r"\D")
+_CNIC_FMT = re.compile(r"^\d{5}-\d{7}-\d$")
+_CNIC_WINDOW = re.compile(r"(\d{5})[-\s]?(\d{7})[-\s]?(\d)\b")
+_CNIC_FULL = re.compile(r"\b(\d{5})[-\s](\d{7})[-\s](\d)\b")
+_CNIC_13_DIGITS = re.compile(r"(\d{13})")
+_DATE_RE = re.compile(r"\b(?:\d{2}[./-]\d{2}[./-]\d{4}|\d{4}[./-]\d{2}[./-]\d{2})\b")
+# Accepted layouts: DD.MM.YYYY / DD-MM-YYYY / DD/MM/YYYY and YYYY-MM-DD / YYYY/MM/DD
+_DATE_DMY = re.compile(r"^(\d{2})([./-])(\d{2})\2(\d{4})$")
+_DATE_YMD = re.compile(r"^(\d{4})([/-])(\d{2})\2(\d{2})$")
+
+# Document-type keywords (one C-level scan per OCR text instead of a Python loop per keyword)
+FRONT_KEYWORDS = ("IDENTITY", "CARD", "PAKISTAN", "ISLAMIC", "REPUBLIC", "NADRA", "NATIONAL")
+BACK_KEYWORDS = ("NADRA", "PAKISTAN", "IDENTITY", "CARD", "ADDRESS")
+_KEYWORDS_FRONT = re.compile("|".join(FRONT_KEYWORDS))
+_KEYWORDS_BACK = re.compile("|".join(BACK_KEYWORDS))
+
+
+# Front-side gate: (score weight, reason when the signal is missing), in signal order:
+# keywords, card aspect ratio, face photo, CNIC number
+_FRONT_SCORE_RULES = (
+    (2, "missing_cnic_keywords"),
+    (1, "unexpected_aspect_ratio"),
+    (1, "no_face_detected"),
+    (2, "cnic_number_not_found"),
+)
+
+
+@lru_cache(maxsize=256)
+def _parse_cnic_date(date_str: str) -> Optional[datetime]:
+    """Parse an OCR'd CNIC date without a strptime try/except cascade (memoized: expiry and DOB checks parse the same dates)"""
+    m = _DATE_DMY.match(date_str)
+    if m:
+        day, month, year = m.group(1), m.group(3), m.group(4)
+    else:
+        m = _DATE_YMD.match(date_str)
+        if not m:
+            return None
+        year, month, day = m.group(1), m.group(3), m.group(4)
+    try:
+        return datetime(int(year), int(month), int(day))
+    except ValueError:
+        return None  # e.g. month 13 from an OCR misread
+
+
+def _keyword_hits(pattern: "re.Pattern[str]", keywords: Tuple[str, ...], txt: str) -> List[str]:
+    """Keywords found in txt (single scan), in the keyword tuple's order"""
+    found = set(pattern.findall(txt))
+    return [k for k in keywords if k in found]
+
+# Name parsing: lines containing card labels are never names
+_NAME_STOPWORDS = re.compile(r'IDENTITY|CARD|ISLAMIC|REPUBLIC|PAKISTAN|DATE|BIRTH|HOLDER|SIGNATURE|FATHER|S/O|D/O')
+_NON_NAME_CHARS = re.compile(r'[^A-Z\s]')
+_NAME_WORD = re.compile(r'[A-Z]{2,}')
+
+
+def is_allowed_image(file: UploadFile) -> bool:
+    """JPG/PNG extension, with a JPG/PNG content type (or none / generic octet-stream)"""
+    _, dot, ext = (file.filename or "").rpartition(".")
+    if not dot or ext.lower() not in ALLOWED_EXTENSIONS:
+        return False
+    content_type = (file.content_type or "").split(";")[0].strip().lower()
+    return content_type in ALLOWED_CONTENT_TYPES or content_type in UNTYPED_CONTENT_TYPES
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Read an upload in chunks, failing fast once it exceeds max_bytes"""
+    too_large = HTTPException(
+        status_code=413,
+        detail=f"Image too large. Maximum size is {max_bytes // (1024 * 1024)}MB."
+    )
+    # Starlette records the spooled size; reject without reading when it's already known
+    size = getattr(file, "size", None)
+    if size is not None and size > max_bytes:
+        raise too_large
+
+    buf = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_BYTES)
+        if not chunk:
+            break
+        buf.extend(chunk)
+        if len(buf) > max_bytes:
+            raise too_large
+    return bytes(buf)
+
+
+def _decode_image(image_bytes: bytes) -> Optional[np.ndarray]:
+    """Decode image bytes straight to grayscale, letting libjpeg downscale very large photos during decode"""
+    # Every check (OCR, readability, face, QR) works on grayscale; skipping the
+    # color planes saves the chroma upsampling and two thirds of the pixel memory
+    flags = cv2.IMREAD_GRAYSCALE
+    try:
+        # Header-only read; does not decode pixels
+        with Image.open(io.BytesIO(image_bytes)) as header:
+            if max(header.size) > REDUCED_DECODE_MIN_SIDE:
+                flags = cv2.IMREAD_REDUCED_GRAYSCALE_2
+    except Exception:
+        pass  # Let cv2 decide whether the data is a valid image
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    return cv2.imdecode(nparr, flags)
+
+
+# cv2.QRCodeDetector keeps internal state, so reuse one per thread instead of one per call
+_qr_local = threading.local()
+
+# Optional WeChat QR model files (detect.prototxt/.caffemodel, sr.prototxt/.caffemodel).
+# Without them the WeChat detector still works, just without the CNN + super-resolution stages.
+WECHAT_QR_MODEL_DIR = os.getenv("WECHAT_QR_MODEL_DIR", "")
+
+
+def _get_wechat_qr_detector():
+    detector = getattr(_qr_local, "wechat", None)
+    if detector is None:
+        model_dir = Path(WECHAT_QR_MODEL_DIR) if WECHAT_QR_MODEL_DIR else None
+        model_files = [
+            model_dir / name for name in ("detect.prototxt", "detect.caffemodel", "sr.prototxt", "sr.caffemodel")
+        ] if model_dir else []
+        if model_files and all(f.exists() for f in model_files):
+            detector = cv2.wechat_qrcode.WeChatQRCode(*[str(f) for f in model_files])
+        else:
+            detector = cv2.wechat_qrcode.WeChatQRCode()
+        _qr_local.wechat = detector
+    return detector
+
+
+def _qr_decode_wechat(img: np.ndarray) -> List[str]:
+    """Decode QR payloads with OpenCV's WeChat detector (opencv-contrib only)"""
+    try:
+        results, _ = _get_wechat_qr_detector().detectAndDecode(img)
+    except Exception:
+        return []
+    payloads: List[str] = []
+    for data in results or []:
+        if data and data not in payloads:
+            payloads.append(data)
+    return payloads
+
+
+def _get_qr_detector():
+    detector = getattr(_qr_local, "detector", None)
+    if detector is None:
+        detector = _qr_local.detector = cv2.QRCodeDetector()
+    return detector
+
+
+def _qr_decode_pyzbar(images: List[np.ndarray]) -> List[str]:
+    """Decode QR payloads with pyzbar, stopping at the first image that yields data"""
+    payloads: List[str] = []
+    for img in images:
+        try:
+            decoded_objects = pyzbar_mod.decode(img) if pyzbar_mod else []
+        except Exception:
+            continue
+        for obj in decoded_objects:
+            try:
+                data = obj.data.decode('utf-8')
+            except Exception:
+                continue
+            if data and data not in payloads:
+                payloads.append(data)
+        if payloads:
+            break
+    return payloads
+
+
+def _qr_decode_opencv(images: List[np.ndarray]) -> List[str]:
+    """Decode QR payloads with OpenCV, stopping at the first image that yields data"""
+    payloads: List[str] = []
+    detector = _get_qr_detector()
+    for img in images:
+        try:
+            # Multi-detect
+            try:
+                ok, decoded_info, points, _ = detector.detectAndDecodeMulti(cast(Any, img))
+                if ok and decoded_info:
+                    for data in decoded_info:
+                        if data and data not in payloads:
+                            payloads.append(data)
+            except Exception:
+                pass
+            # Single detect
+            data, points, _ = detector.detectAndDecode(cast(Any, img))
+            if data and data not in payloads:
+                payloads.append(data)
+        except Exception:
+            continue
+        if payloads:
+            break
+    return payloads
+
+
+@contextmanager
+def _tess_api(psm: int) -> Iterator[Any]:
+    """Borrow a pooled tesserocr engine set to page-seg mode psm (created lazily, up to the pool size)"""
+    global _tess_pool_created
+    try:
+        api = _tess_pool.get_nowait()
+    except queue.Empty:
+        api = None
+        with _tess_pool_lock:
+            if _tess_pool_created < TESS_ENGINE_POOL_SIZE:
+                _tess_pool_created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                api = tesserocr.PyTessBaseAPI(lang="eng")
+            except Exception:
+                with _tess_pool_lock:
+                    _tess_pool_created -= 1
+                raise
+        else:
+            api = _tess_pool.get()
+    try:
+        api.SetPageSegMode(psm)
+        yield api
+    finally:
+        _tess_pool.put(api)
+
+
+def _tess_set_image(api, img: np.ndarray, whitelist: Optional[str]) -> None:
+    """Hand the pixel buffer straight to Tesseract (no PIL image in between)"""
+    img = np.ascontiguousarray(img)
+    h, w = img.shape[:2]
+    bytes_per_pixel = 1 if img.ndim == 2 else img.shape[2]
+    api.SetVariable("tessedit_char_whitelist", whitelist or "")
+    api.SetImageBytes(img.tobytes(), w, h, bytes_per_pixel, w * bytes_per_pixel)
+
+
+def ocr_image_to_string(img: np.ndarray, psm: int = 3, whitelist: Optional[str] = None) -> str:
+    """OCR an image to text (tesserocr when installed, pytesseract otherwise)"""
+    if TESSEROCR_AVAILABLE:
+        with _tess_api(psm) as api:
+            _tess_set_image(api, img, whitelist)
+            return api.GetUTF8Text()
+    config = f"--psm {psm}"
+    if whitelist:
+        config += f" -c tessedit_char_whitelist={whitelist.strip()}"
+    return pytesseract.image_to_string(img, lang="eng", config=config)
+
+
+def ocr_image_to_words(img: np.ndarray, whitelist: Optional[str] = None) -> Tuple[List[str], List[float]]:
+    """OCR an image into (words, confidences); confidence is -1 when unknown"""
+    if TESSEROCR_AVAILABLE:
+        with _tess_api(3) as api:
+            _tess_set_image(api, img, whitelist)
+            word_confs = api.MapWordConfidences()
+        words = []
+        confs = []
+        for word, conf in word_confs:
+            word = (word or "").strip()
+            if word:
+                words.append(word)
+                confs.append(float(conf))
+        return words, confs
+
+    config = f"-c tessedit_char_whitelist={whitelist.strip()}" if whitelist else ""
+    data = pytesseract.image_to_data(img, lang="eng", config=config, output_type=pytesseract.Output.DICT)
+    words = []
+    confs = []
+    n = len(data.get('text', []))
+    for i in range(n):
+        w = data['text'][i].strip() if data['text'][i] is not None else ''
+        if w:
+            words.append(w)
+            try:
+                confs.append(float(data['conf'][i]))
+            except (TypeError, ValueError):
+                confs.append(-1)
+    return words, confs
+
+
+def _cached_ocr(key: Tuple[Any, ...], compute):
+    """Return the cached OCR result for key, running compute() on a miss"""
+    with _ocr_results_lock:
+        if key in _ocr_results:
+            _ocr_results.move_to_end(key)
+            return _ocr_results[key]
+
+    shared = OCR_SHARED_CACHE_ENABLED and response_cache.is_shared
+    shared_key = "cnic-ocr:" + ":".join(map(str, key)) if shared else None
+    result = response_cache.get(shared_key) if shared_key else None
+    if result is None:
+        result = compute()
+        if shared_key:
+            response_cache.set(shared_key, result, OCR_SHARED_CACHE_TTL)
+    with _ocr_results_lock:
+        _ocr_results[key] = result
+        if len(_ocr_results) > OCR_CACHE_SIZE:
+            _ocr_results.popitem(last=False)
+    return result
+
 
 class CNICProcessor:
     """CNIC OCR Processor for validation"""
     
     def __init__(self, image_bytes):
-        # Convert bytes to numpy array
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        img = _decode_image(image_bytes)
         if img is None:
             raise ValueError("Invalid image data")
+        h, w = img.shape[:2]
+        longest = max(h, w)
+        if longest > MAX_IMAGE_SIDE:
+            scale = MAX_IMAGE_SIDE / float(longest)
+            img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
         self.image = cast(np.ndarray, img)
-    
-    def preprocess_image(self):
-        """Prepares image for OCR"""
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        gray = cv2.bilateralFilter(gray, 11, 17, 17)
-        thresh = cv2.adaptiveThreshold(
-            gray, 255,
+        # Decoded as grayscale, which is shared by every check below
+        self._gray = self.image
+        # Identifies this upload in the shared OCR result cache
+        self.content_hash = hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+    @cached_property
+    def _gray_blurred(self) -> np.ndarray:
+        """Lightly smoothed gray image used for OCR"""
+        # A 3x3 Gaussian removes sensor noise as well as the old 11px bilateral
+        # filter did for Tesseract, at a small fraction of the cost
+        return cv2.GaussianBlur(self._gray, (3, 3), 0)
+
+    @cached_property
+    def _adaptive_thresh(self) -> np.ndarray:
+        return cv2.adaptiveThreshold(
+            self._gray_blurred, 255,
             cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
             cv2.THRESH_BINARY, 31, 2
         )
-        return gray, thresh
+
+    @cached_property
+    def _quick_gray_downscaled(self) -> np.ndarray:
+        """Gray image capped at 1200px wide for the quick document-type OCR pass"""
+        gray = self._gray
+        h, w = gray.shape[:2]
+        max_w = 1200
+        if w > max_w:
+            scale = max_w / float(w)
+            gray = cv2.resize(gray, (max_w, int(h * scale)), interpolation=cv2.INTER_AREA)
+        return gray
+
+    @cached_property
+    def _quick_ocr_image(self) -> np.ndarray:
+        downscaled = self._quick_gray_downscaled
+        if downscaled is self._gray:
+            # Narrow photos aren't downscaled; share the full-size blur instead of redoing it
+            return self._gray_blurred
+        return cv2.GaussianBlur(downscaled, (3, 3), 0)
+
+    def _ocr_string(self, source: str, psm: int = 3, whitelist: Optional[str] = None) -> str:
+        """OCR one of this processor's images (named by attribute) to text, via the shared cache"""
+        key = (self.content_hash, source, psm, whitelist)
+        return _cached_ocr(key, lambda: ocr_image_to_string(getattr(self, source), psm=psm, whitelist=whitelist))
+
+    def _ocr_words(self, scale: float, whitelist: Optional[str] = None) -> Tuple[List[str], List[float]]:
+        """OCR the preprocessed gray image at scale into (words, confidences), via the shared cache"""
+        def compute():
+            gray = self._gray_blurred
+            if scale != 1.0:
+                h, w = gray.shape[:2]
+                gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
+            return ocr_image_to_words(gray, whitelist=whitelist)
+        return _cached_ocr((self.content_hash, "words", scale, whitelist), compute)
+    
+    def preprocess_image(self):
+        """Prepares image for OCR"""
+        return self._gray_blurred, self._adaptive_thresh
 
     # Valid first digits for Pakistani CNIC province codes (1-8)
-    _VALID_PROVINCE_DIGITS = set("12345678")
+    _VALID_PROVINCE_DIGITS = frozenset("12345678")
 
     def _normalize_cnic(self, text: str) -> Optional[str]:
         """Extract CNIC from QR: drop last digit, take last 13, format."""
@@ -55,31 +486,24 @@ class CNICProcessor:
             return None
         
         # Strip all non-digits
-        digits = re.sub(r"\D", "", text)
+        digits = _NON_DIGIT.sub("", text)
         
         # Drop last digit, take last 13, format
         cnic_digits = digits[:-1][-13:]
+        if len(cnic_digits) < 13:
+            return None
         return f"{cnic_digits[:5]}-{cnic_digits[5:12]}-{cnic_digits[12]}"
 
     def _mask_cnic(self, cnic: Optional[str]) -> Optional[str]:
-        if not cnic or not re.match(r"^\d{5}-\d{7}-\d$", cnic):
+        if not cnic or not _CNIC_FMT.match(cnic):
             return None
         return f"{cnic}"
 
     def _quick_ocr_text(self) -> str:
         """Fast, low-cost OCR pass used for document-type gating (avoid random docs)."""
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        h, w = gray.shape[:2]
-
-        # Downscale large images for speed/stability
-        max_w = 1200
-        if w > max_w:
-            scale = max_w / float(w)
-            gray = cv2.resize(gray, (max_w, int(h * scale)), interpolation=cv2.INTER_AREA)
-
-        gray = cv2.GaussianBlur(gray, (3, 3), 0)
+        # Downscaled for speed/stability
         try:
-            txt = pytesseract.image_to_string(gray, lang="eng", config="--psm 6")
+            txt = self._ocr_string("_quick_ocr_image", psm=6)
         except Exception:
             txt = ""
         return (txt or "").upper()
@@ -94,16 +518,15 @@ class CNICProcessor:
 
     def _front_face_count(self) -> int:
         try:
-            gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-            cv2_data = getattr(cv2, "data", None)
-            haar_dir = getattr(cv2_data, "haarcascades", "") if cv2_data else ""
-            if not haar_dir:
-                return 0
-            cascade_path = haar_dir + "haarcascade_frontalface_default.xml"
-            face_cascade = cv2.CascadeClassifier(cascade_path)
-            if face_cascade.empty():
+            if _FACE_CASCADE is None or _FACE_CASCADE.empty():
                 return 0
-            faces = face_cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(40, 40))
+            gray = self._gray
+            h, w = gray.shape[:2]
+            longest = max(h, w)
+            if longest > FACE_DETECT_MAX_SIDE:
+                scale = FACE_DETECT_MAX_SIDE / float(longest)
+                gray = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+            faces = _FACE_CASCADE.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=(40, 40))
             return int(len(faces))
         except Exception:
             return 0
@@ -111,10 +534,7 @@ class CNICProcessor:
     def looks_like_cnic_front(self) -> Dict[str, Any]:
         """Heuristic gate to reduce OCR on random documents."""
         txt = self._quick_ocr_text()
-        keywords = [
-            "IDENTITY", "CARD", "PAKISTAN", "ISLAMIC", "REPUBLIC", "NADRA", "NATIONAL"
-        ]
-        hits = [k for k in keywords if k in txt]
+        hits = _keyword_hits(_KEYWORDS_FRONT, FRONT_KEYWORDS, txt)
 
         aspect_ok, ratio = self._card_aspect_ratio_ok()
         face_count = self._front_face_count()
@@ -123,26 +543,16 @@ class CNICProcessor:
         maybe_cnic = self._normalize_cnic(txt)
 
         # Scoring: require multiple independent signals
+        signals = (len(hits) >= 2, aspect_ok, face_count >= 1, bool(maybe_cnic))
         score = 0
-        if len(hits) >= 2:
-            score += 2
-        if aspect_ok:
-            score += 1
-        if face_count >= 1:
-            score += 1
-        if maybe_cnic:
-            score += 2
+        reason = []
+        for passed, (weight, fail_reason) in zip(signals, _FRONT_SCORE_RULES):
+            if passed:
+                score += weight
+            else:
+                reason.append(fail_reason)
 
         is_cnic = score >= 4  # conservative: reduce false positives
-        reason = []
-        if len(hits) < 2:
-            reason.append("missing_cnic_keywords")
-        if not aspect_ok:
-            reason.append("unexpected_aspect_ratio")
-        if face_count < 1:
-            reason.append("no_face_detected")
-        if not maybe_cnic:
-            reason.append("cnic_number_not_found")
 
         return {
             "is_cnic": bool(is_cnic),
@@ -155,8 +565,7 @@ class CNICProcessor:
 
     def looks_like_cnic_back(self) -> Dict[str, Any]:
         txt = self._quick_ocr_text()
-        keywords = ["NADRA", "PAKISTAN", "IDENTITY", "CARD", "ADDRESS"]
-        hits = [k for k in keywords if k in txt]
+        hits = _keyword_hits(_KEYWORDS_BACK, BACK_KEYWORDS, txt)
         aspect_ok, ratio = self._card_aspect_ratio_ok()
         return {
             "is_cnic": bool(aspect_ok and len(hits) >= 1),
@@ -166,14 +575,18 @@ class CNICProcessor:
     
     def check_readability(self):
         """Check if CNIC is readable (not blurry)"""
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        gray = self._gray
         
         # Calculate Laplacian variance (blur detection)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+        # CV_16S holds the default 3x3 aperture's full range exactly (|v| <= 1020),
+        # so this matches the float64 variance at a quarter of the memory
+        laplacian = cv2.Laplacian(gray, cv2.CV_16S)
+        _, std = cv2.meanStdDev(laplacian)
+        laplacian_var = float(std[0, 0]) ** 2
         
         # Check edge density (micro-print patterns)
         edges = cv2.Canny(gray, 60, 150)
-        edge_density = (edges > 0).mean()
+        edge_density = cv2.countNonZero(edges) / float(edges.size)
         
         is_readable = laplacian_var > 100 and edge_density > 0.05
         
@@ -184,81 +597,78 @@ class CNICProcessor:
             "quality": "Good" if is_readable else "Poor - Image too blurry or low quality"
         }
     
+    @staticmethod
+    def _score_cnic_windows(words: List[str], confs: List[float]) -> Tuple[Optional[str], float]:
+        """Best-scoring CNIC number among one OCR pass's words, with its score"""
+        best_cnic = None
+        best_score = -1
+        
+        # Scan the joined words once for the explicit 5-7-1 pattern, then map
+        # each match back to the word range it spans
+        joined = ' '.join(words)
+        word_starts = []
+        pos = 0
+        for word in words:
+            word_starts.append(pos)
+            pos += len(word) + 1
+        
+        for m in _CNIC_WINDOW.finditer(joined):
+            first = bisect_right(word_starts, m.start()) - 1
+            last = bisect_right(word_starts, m.end() - 1) - 1
+            if last - first + 1 > CNIC_WINDOW_MAX_WORDS:
+                continue
+            normalized = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
+            
+            # Score every window of up to CNIC_WINDOW_MAX_WORDS words containing the match
+            for i in range(max(0, last - CNIC_WINDOW_MAX_WORDS + 1), first + 1):
+                for L in range(last - i + 1, min(CNIC_WINDOW_MAX_WORDS, len(words) - i) + 1):
+                    avg_conf = 50
+                    if confs and len(confs) >= i+L:
+                        valid = [c for c in confs[i:i+L] if c >= 0]
+                        if valid:
+                            avg_conf = sum(valid) / len(valid)
+                    score = avg_conf + (L * 5)
+                    if score > best_score:
+                        best_score = score
+                        best_cnic = normalized
+        
+        return best_cnic, best_score
+    
     def extract_cnic_number(self):
         """Extract CNIC number using multi-scale OCR"""
-        gray, _ = self.preprocess_image()
-        
-        def ocr_data_for(img):
+        def ocr_data_for(scale):
             try:
-                data = pytesseract.image_to_data(img, lang="eng", output_type=pytesseract.Output.DICT)
-                words = []
-                confs = []
-                n = len(data.get('text', []))
-                for i in range(n):
-                    w = data['text'][i].strip() if data['text'][i] is not None else ''
-                    if w:
-                        words.append(w)
-                        try:
-                            confs.append(int(data['conf'][i]))
-                        except:
-                            try:
-                                confs.append(float(data['conf'][i]))
-                            except:
-                                confs.append(-1)
-                return {"words": words, "conf": confs}
-            except:
-                return {"words": [], "conf": []}
+                words, confs = self._ocr_words(scale, whitelist=CNIC_DIGIT_WHITELIST)
+                return self._score_cnic_windows(words, confs)
+            except Exception:
+                return None, -1
         
-        best_cnic = None
-        best_score = -1
+        # Native scale first; a confident read there skips the upscaled passes
+        best_cnic, best_score = ocr_data_for(OCR_SCALES[0])
+        if best_score < CNIC_EARLY_EXIT_SCORE:
+            # Remaining scales OCR'd concurrently; merged in scale order so ties keep the earlier scale
+            for cnic, score in _ocr_executor.map(ocr_data_for, OCR_SCALES[1:]):
+                if score > best_score:
+                    best_score = score
+                    best_cnic = cnic
         
-        # Try multiple scales
-        for scale in [1.0, 1.5, 2.0]:
-            if scale == 1.0:
-                img = gray
-            else:
-                h, w = gray.shape[:2]
-                img = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_LINEAR)
-            
-            od = ocr_data_for(img)
-            words = od.get('words', [])
-            confs = od.get('conf', [])
-            
-            # Sliding window to find CNIC pattern
-            for i in range(len(words)):
-                for L in range(1, 6):
-                    if i + L > len(words):
-                        break
-                    window = words[i:i+L]
-                    window_text = ' '.join(window)
-                    
-                    # Look for explicit 5-7-1 pattern
-                    m = re.search(r"(\d{5})[-\s]?(\d{7})[-\s]?(\d)\b", window_text)
-                    if m:
-                        normalized = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
-                        avg_conf = 50
-                        if confs and len(confs) >= i+L:
-                            window_confs = confs[i:i+L]
-                            valid = [c for c in window_confs if c >= 0]
-                            if valid:
-                                avg_conf = sum(valid) / len(valid)
-                        score = avg_conf + (L * 5)
-                        if score > best_score:
-                            best_score = score
-                            best_cnic = normalized
-        
-        # Fallback: extract from full text
+        # Fallback: extract from the full-card text. Not whitelisted: over the whole card the
+        # digit whitelist turns names and labels into digits; this is also the same (cached)
+        # pass the name/keyword checks use.
         if best_cnic is None:
-            raw_text = pytesseract.image_to_string(gray, lang="eng")
-            m = re.search(r"\b(\d{5})[-\s](\d{7})[-\s](\d)\b", raw_text)
+            raw_text = self._ocr_string("_gray_blurred")
+            m = _CNIC_FULL.search(raw_text)
             if m:
                 best_cnic = f"{m.group(1)}-{m.group(2)}-{m.group(3)}"
             else:
-                all_digits = re.sub(r"\D", "", raw_text)
-                m2 = re.search(r"(\d{13})", all_digits)
-                if m2:
-                    d = m2.group(1)
-                    best_cnic = f"{d[:5]}-{d[5:12]}-{d[12]}"
+                # A line whose digits are exactly 13 (separators misread); digits are never
+                # joined across lines, so dates and other numbers can't combine into one
+                for line in raw_text.splitlines():
+                    m2 = _CNIC_13_DIGITS.fullmatch(_NON_DIGIT.sub("", line))
+                    if m2:
+                        d = m2.group(1)
+                        best_cnic = f"{d[:5]}-{d[5:12]}-{d[12]}"
+                        break
         
         return best_cnic
 
@@ -282,60 +692,50 @@ class CNICProcessor:
             return None
 
         # Prefer candidates whose first digit is a valid province code
-        for c in candidates:
-            first_digit = c[0] if c else ""
-            if first_digit in self._VALID_PROVINCE_DIGITS:
-                return c
-
-        return candidates[0]
+        valid_digits = self._VALID_PROVINCE_DIGITS
+        return next((c for c in candidates if c and c[0] in valid_digits), candidates[0])
     
     def extract_dates(self):
         """Extract dates for expiry check"""
-        gray, _ = self.preprocess_image()
-        raw_text = pytesseract.image_to_string(gray, lang="eng")
+        raw_text = self._ocr_string("_gray_blurred")
         
-        date_matches = re.findall(r"\b\d{2}[./-]\d{2}[./-]\d{4}\b", raw_text)
-        date_matches += re.findall(r"\b\d{4}[./-]\d{2}[./-]\d{2}\b", raw_text)
+        date_matches = _DATE_RE.findall(raw_text)
         
-        return list(set(date_matches))
+        # Deduplicate keeping OCR order, so the response (and the DOB pick on ties) is deterministic
+        return list(dict.fromkeys(date_matches))
     
     def extract_name(self):
         """Extract name from CNIC with multiple OCR attempts"""
-        gray, _ = self.preprocess_image()
-        
         # Try multiple OCR configs for better accuracy
         possible_names = []
         
         # Config 1: Default
-        raw_text = pytesseract.image_to_string(gray, lang="eng")
+        raw_text = self._ocr_string("_gray_blurred")
         possible_names.extend(self._parse_names_from_text(raw_text))
         
-        # Config 2: PSM 6 (uniform block of text)
-        raw_text2 = pytesseract.image_to_string(gray, lang="eng", config="--psm 6")
-        possible_names.extend(self._parse_names_from_text(raw_text2))
+        # Config 2: PSM 6 (uniform block of text) - only needed when the default pass found nothing,
+        # since the first name found is the one returned
+        if not possible_names:
+            raw_text2 = self._ocr_string("_gray_blurred", psm=6)
+            possible_names.extend(self._parse_names_from_text(raw_text2))
         
         # Return most common name or first found
         return possible_names[0] if possible_names else None
     
     def _parse_names_from_text(self, text):
         """Helper to parse names from OCR text"""
-        lines = text.split('\n')
+        upper = text.upper()
+        # Clean the whole text in one pass (newlines are kept, so lines stay aligned)
+        cleaned_lines = _NON_NAME_CHARS.sub('', upper).split('\n')
         names = []
         
-        for line in lines:
+        for line, cleaned in zip(upper.split('\n'), cleaned_lines):
             # Skip lines with common CNIC keywords
-            if re.search(r'(IDENTITY|CARD|ISLAMIC|REPUBLIC|PAKISTAN|DATE|BIRTH|HOLDER|SIGNATURE|FATHER|S/O|D/O)', line.upper()):
-                continue
-            
-            # Clean the line
-            cleaned = re.sub(r'[^A-Z\s]', '', line.upper()).strip()
-            if not cleaned:
+            if _NAME_STOPWORDS.search(line):
                 continue
             
-            words = cleaned.split()
             # Name should have 2-4 words, each at least 2 chars
-            valid_words = [w for w in words if len(w) >= 2]
-            
+            valid_words = _NAME_WORD.findall(cleaned)
             if 2 <= len(valid_words) <= 4:
                 names.append(' '.join(valid_words))
         
@@ -347,14 +747,10 @@ class CNICProcessor:
             return {"is_expired": None, "message": "No expiry date found"}
         
         parsed_dates = []
-        for date_str in dates:
-            for fmt in ["%d.%m.%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%Y/%m/%d"]:
-                try:
-                    dt = datetime.strptime(date_str, fmt)
-                    parsed_dates.append((dt, date_str))
-                    break
-                except ValueError:
-                    continue
+        for date_str in set(dates):
+            dt = _parse_cnic_date(date_str)
+            if dt:
+                parsed_dates.append((dt, date_str))
         
         if not parsed_dates:
             return {"is_expired": None, "message": "Could not parse dates"}
@@ -380,104 +776,114 @@ class CNICProcessor:
             "message": message
         }
     
-    def _build_qr_preprocessing_variants(self) -> List[np.ndarray]:
-        """Build a comprehensive list of preprocessed image variants for QR scanning."""
-        variants: List[np.ndarray] = []
-        h, w = self.image.shape[:2]
+    def _iter_qr_preprocessing_variants(self) -> Iterator[Tuple[str, np.ndarray]]:
+        """Lazily yield (name, image) QR-scan variants, most likely to decode first.
 
-        # 1. Original
-        variants.append(self.image)
-
-        # 2. Grayscale
-        gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
-        variants.append(gray)
+        Each variant is only built when the scanner asks for it, so a QR that
+        decodes on the original photo never pays for thresholds or upscales.
+        """
+        w = self.image.shape[1]
+        gray = self._gray
 
-        # 3. Binary (fixed threshold)
-        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
-        variants.append(binary)
+        # 1. Original (decoded as grayscale; both decoders binarize luminance anyway)
+        yield "gray", gray
 
-        # 4. Otsu threshold (better for varying lighting)
+        # 2. Otsu threshold (better for varying lighting)
         _, otsu = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        variants.append(otsu)
+        yield "otsu", otsu
 
-        # 5. Adaptive threshold
-        adaptive = cv2.adaptiveThreshold(
-            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
-        )
-        variants.append(adaptive)
+        # 3. Cropped to right-half of the card (QR is typically in upper-right)
+        right_half = gray[:, w // 2 :]
+        yield "right_half", right_half
 
-        # 6. CLAHE (enhanced contrast)
+        # 4. CLAHE (enhanced contrast)
         clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(gray)
-        variants.append(enhanced)
+        yield "clahe", clahe.apply(gray)
 
-        # 7. Sharpened
-        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
-        sharpened = cv2.filter2D(gray, -1, kernel)
-        variants.append(sharpened)
+        # 5. Right half upscaled 2x
+        yield "right_half_2x", cv2.resize(right_half, (right_half.shape[1] * 2, right_half.shape[0] * 2), interpolation=cv2.INTER_CUBIC)
 
-        # 8. Inverted binary
-        _, inverted = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-        variants.append(inverted)
+        # 6. Binary (fixed threshold) and inverted binary
+        _, binary = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
+        yield "binary", binary
+        yield "binary_inv", cv2.bitwise_not(binary)
 
-        # 9-10. Upscaled variants (2x, 3x) — helps when QR is small in the image
-        for scale in [2.0, 3.0]:
-            upscaled = cv2.resize(gray, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_CUBIC)
-            variants.append(upscaled)
-            _, up_otsu = cv2.threshold(upscaled, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            variants.append(up_otsu)
+        # 7. Adaptive threshold
+        yield "adaptive", cv2.adaptiveThreshold(
+            gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2
+        )
 
-        # 11. Cropped to right-half of the card (QR is typically in upper-right)
-        right_half = gray[:, w // 2 :]
-        variants.append(right_half)
-        right_up = cv2.resize(right_half, (right_half.shape[1] * 2, right_half.shape[0] * 2), interpolation=cv2.INTER_CUBIC)
-        variants.append(right_up)
+        # 8. Sharpened
+        kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]], dtype=np.float32)
+        yield "sharpened", cv2.filter2D(gray, -1, kernel)
 
-        return variants
+    def _qr_candidate_crops(self) -> List[np.ndarray]:
+        """Crop the regions OpenCV locates as QR codes (even when it can't decode them)."""
+        gray = self._gray
+        h, w = gray.shape[:2]
+        detector = _get_qr_detector()
+        quads = []
+        try:
+            ok, points = detector.detectMulti(gray)
+            if ok and points is not None:
+                quads = list(points)
+        except Exception:
+            pass
+        if not quads:
+            try:
+                ok, points = detector.detect(gray)
+                if ok and points is not None:
+                    quads = list(points.reshape(-1, 4, 2))
+            except Exception:
+                pass
+
+        crops: List[np.ndarray] = []
+        for quad in quads:
+            xs = quad[:, 0]
+            ys = quad[:, 1]
+            x0 = max(int(xs.min()) - QR_CROP_MARGIN, 0)
+            y0 = max(int(ys.min()) - QR_CROP_MARGIN, 0)
+            x1 = min(int(xs.max()) + QR_CROP_MARGIN, w)
+            y1 = min(int(ys.max()) + QR_CROP_MARGIN, h)
+            if x1 > x0 and y1 > y0:
+                crops.append(gray[y0:y1, x0:x1])
+        return crops
 
     def scan_qr_code(self):
         """Scan QR code from CNIC back side with comprehensive preprocessing."""
-        payloads: List[str] = []
-        images_to_try = self._build_qr_preprocessing_variants()
-
-        # ---- Pass 1: OpenCV QRCodeDetector ----
-        detector = cv2.QRCodeDetector()
-        for img in images_to_try:
+        # ---- Pass 0: WeChat detector on the original photo (handles blur/rotation itself) ----
+        if WECHAT_QR_AVAILABLE:
+            payloads = _qr_decode_wechat(self.image)
             if payloads:
-                break  # stop early once we have data
-            try:
-                # Multi-detect
-                try:
-                    ok, decoded_info, points, _ = detector.detectAndDecodeMulti(cast(Any, img))
-                    if ok and decoded_info:
-                        for data in decoded_info:
-                            if data and data not in payloads:
-                                payloads.append(data)
-                except Exception:
-                    pass
-                # Single detect
-                data, points, _ = detector.detectAndDecode(cast(Any, img))
-                if data and data not in payloads:
-                    payloads.append(data)
-            except Exception:
-                continue
+                return {"success": True, "message": "QR code scanned successfully", "payloads": payloads}
+
+        variants = self._iter_qr_preprocessing_variants()
+        top_images = [img for _, img in islice(variants, QR_PRIORITY_VARIANTS)]
+
+        # ---- Pass 1: pyzbar and OpenCV side by side on the likeliest variants ----
+        # (both decoders release the GIL; pyzbar's results are preferred)
+        if PYZBAR_AVAILABLE:
+            pyzbar_future = _qr_executor.submit(_qr_decode_pyzbar, top_images)
+            opencv_payloads = _qr_decode_opencv(top_images)
+            payloads = pyzbar_future.result()
+            payloads += [data for data in opencv_payloads if data not in payloads]
+        else:
+            payloads = _qr_decode_opencv(top_images)
 
-        # ---- Pass 2: pyzbar (reads QR and many other barcode types) ----
-        if PYZBAR_AVAILABLE and not payloads:
-            try:
-                for img in images_to_try:
-                    if payloads:
-                        break
-                    decoded_objects = pyzbar_mod.decode(img) if pyzbar_mod else []
-                    for obj in decoded_objects:
-                        try:
-                            data = obj.data.decode('utf-8')
-                            if data and data not in payloads:
-                                payloads.append(data)
-                        except Exception:
-                            continue
-            except Exception:
-                pass
+        # ---- Pass 2: decode just the regions OpenCV locates as QR codes ----
+        # (replaces full-image 2x/3x upscales, which cost 4-9x the pixels)
+        if not payloads:
+            for crop in self._qr_candidate_crops():
+                payloads = (_qr_decode_pyzbar([crop]) if PYZBAR_AVAILABLE else []) or _qr_decode_opencv([crop])
+                if payloads:
+                    break
+
+        # ---- Pass 3: remaining variants, pyzbar first then OpenCV ----
+        if not payloads:
+            for _, img in variants:
+                payloads = (_qr_decode_pyzbar([img]) if PYZBAR_AVAILABLE else []) or _qr_decode_opencv([img])
+                if payloads:
+                    break
 
         if not payloads:
             return {
@@ -513,8 +919,42 @@ class PairVerificationResponse(BaseModel):
     message: str
 
 
+def save_cnic_verification(row: Dict[str, Any]) -> None:
+    """Insert a cnic_verification record (runs as a background task after the response is sent)"""
+    try:
+        supabase.table("cnic_verification").insert(row).execute()
+    except Exception as db_error:
+        # Log error but don't fail the request
+        print(f"Warning: Could not save CNIC verification to database: {db_error}")
+
+
+def save_verified_cnic_pair(row: Dict[str, Any]) -> None:
+    """Insert the cnic_verification record and mark the user CNIC-verified"""
+    # Use database function: one round trip, both writes in a single transaction
+    try:
+        supabase.rpc("verify_cnic_pair", {
+            "p_user_id": row["user_id"],
+            "p_upload_path": row["upload_path"],
+            "p_cnic": row["extracted_cnic"],
+            "p_name": row["extracted_name"],
+            "p_status": row["status"],
+            "p_notes": row["notes"],
+        }).execute()
+        return
+    except Exception as rpc_error:
+        print(f"Warning: verify_cnic_pair RPC not available, using fallback writes: {rpc_error}")
+
+    # Fallback: two separate writes
+    supabase.table("cnic_verification").insert(row).execute()
+    supabase.table("users").update({
+        "cnic_verified": True,
+        "cnic_number": row["extracted_cnic"]
+    }).eq("id", row["user_id"]).execute()
+
+
 @router.post("/verify", response_model=VerificationResponse)
 async def verify_cnic(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: Any = Depends(get_current_user)
 ):
@@ -524,20 +964,21 @@ async def verify_cnic(
     """
     try:
         # Validate file format
-        if not file.filename or not file.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+        if not is_allowed_image(file):
             raise HTTPException(
                 status_code=400, 
                 detail="Invalid file format. Please upload JPG or PNG image of your Computerized NIC (not handwritten NICOP)"
             )
         
         # Read file bytes
-        file_bytes = await file.read()
+        file_bytes = await read_upload(file)
         
-        # Process CNIC
-        processor = CNICProcessor(file_bytes)
+        # Process CNIC (decode off the event loop)
+        processor = await asyncio.to_thread(CNICProcessor, file_bytes)
 
         # Reject non-CNIC-looking images early (avoid OCR on random docs)
-        doc_check = processor.looks_like_cnic_front()
+        # OCR/CV calls are blocking, so each runs in a worker thread
+        doc_check = await asyncio.to_thread(processor.looks_like_cnic_front)
         if not doc_check.get("is_cnic"):
             raise HTTPException(
                 status_code=400,
@@ -545,7 +986,7 @@ async def verify_cnic(
             )
         
         # Check readability
-        readability = processor.check_readability()
+        readability = await asyncio.to_thread(processor.check_readability)
         
         if not readability["is_readable"]:
             return VerificationResponse(
@@ -557,13 +998,13 @@ async def verify_cnic(
             )
         
         # Extract CNIC number
-        cnic_number = processor.extract_cnic_number()
+        cnic_number = await asyncio.to_thread(processor.extract_cnic_number)
         
         # Extract name
-        possible_name = processor.extract_name()
+        possible_name = await asyncio.to_thread(processor.extract_name)
         
         # Extract and check expiry
-        dates = processor.extract_dates()
+        dates = await asyncio.to_thread(processor.extract_dates)
         expiry_info = processor.check_expiry(dates)
         
         # Store in database for verification
@@ -582,18 +1023,13 @@ async def verify_cnic(
                 extracted_dob = None
                 if dates:
                     for date_str in dates:
-                        for fmt in ["%d.%m.%Y", "%d-%m-%Y", "%d/%m/%Y", "%Y-%m-%d", "%Y/%m/%d"]:
-                            try:
-                                dt = datetime.strptime(date_str, fmt)
-                                # Assume oldest date is DOB
-                                if not extracted_dob or dt < extracted_dob:
-                                    extracted_dob = dt.date()
-                                break
-                            except ValueError:
-                                continue
+                        dt = _parse_cnic_date(date_str)
+                        # Assume oldest date is DOB
+                        if dt and (not extracted_dob or dt.date() < extracted_dob):
+                            extracted_dob = dt.date()
                 
-                # Insert CNIC verification record matching your schema
-                supabase.table("cnic_verification").insert({
+                # Insert CNIC verification record matching your schema (after the response is sent)
+                background_tasks.add_task(save_cnic_verification, {
                     "user_id": user_id,
                     "upload_path": file.filename,  # Store filename as placeholder
                     "extracted_cnic": cnic_number,
@@ -601,7 +1037,7 @@ async def verify_cnic(
                     "extracted_dob": extracted_dob.isoformat() if extracted_dob else None,
                     "status": "approved" if not expiry_info.get("is_expired") else "rejected",
                     "notes": expiry_info.get("message", "")
-                }).execute()
+                })
         except Exception as db_error:
             # Log error but don't fail the request
             print(f"Warning: Could not save to database: {db_error}")
@@ -620,6 +1056,8 @@ async def verify_cnic(
                     else "CNIC expired or invalid. Please use a valid Computerized NIC."
         )
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -636,26 +1074,27 @@ async def verify_cnic_back(
     """
     try:
         # Validate file format
-        if file.filename and not file.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+        if file.filename and not is_allowed_image(file):
             raise HTTPException(
                 status_code=400, 
                 detail="Invalid file format. Please upload JPG or PNG image"
             )
         
         # Read file bytes
-        file_bytes = await file.read()
+        file_bytes = await read_upload(file)
         
-        # Process CNIC back side
-        processor = CNICProcessor(file_bytes)
+        # Process CNIC back side (decode off the event loop)
+        processor = await asyncio.to_thread(CNICProcessor, file_bytes)
 
-        doc_check = processor.looks_like_cnic_back()
-        
-        # Scan QR code
-        qr_result = processor.scan_qr_code()
+        # Scan QR code first: a decoded QR proves it's a CNIC back, so the OCR gate is skipped
+        qr_result = await asyncio.to_thread(processor.scan_qr_code)
 
         cnic_from_qr = None
         if qr_result.get("success"):
+            doc_check = {"is_cnic": True, "via": "qr"}
             cnic_from_qr = processor.extract_cnic_from_qr_payloads(qr_result.get("payloads", []))
+        else:
+            doc_check = await asyncio.to_thread(processor.looks_like_cnic_back)
         
         return {
             "is_readable": True,
@@ -665,14 +1104,52 @@ async def verify_cnic_back(
             "message": qr_result.get("message", "QR code scanned") if qr_result.get("success") else qr_result.get("message", "No QR code found")
         }
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Back side verification failed: {str(e)}")
 
 
+def process_front(image_bytes: bytes) -> Dict[str, Any]:
+    """Front-side pipeline for /verify-pair: document gate, readability, CNIC number, expiry and name"""
+    front = CNICProcessor(image_bytes)
+    result = {"doc": front.looks_like_cnic_front(), "readability": {}, "cnic": None, "expiry_info": None, "name": None}
+    if not result["doc"].get("is_cnic"):
+        return result
+
+    result["readability"] = front.check_readability()
+    if not result["readability"].get("is_readable"):
+        return result
+
+    result["cnic"] = front.extract_cnic_number()
+    if result["cnic"]:
+        result["expiry_info"] = front.check_expiry(front.extract_dates())
+        result["name"] = front.extract_name()
+    return result
+
+
+def process_back(image_bytes: bytes) -> Dict[str, Any]:
+    """Back-side pipeline for /verify-pair: document gate, QR scan, readability and QR CNIC number"""
+    back = CNICProcessor(image_bytes)
+    qr_result = back.scan_qr_code()
+    # A decoded QR proves it's a CNIC back; only fall back to the OCR gate when QR fails
+    doc = {"is_cnic": True, "via": "qr"} if qr_result.get("success") else back.looks_like_cnic_back()
+    is_cnic = bool(doc.get("is_cnic"))
+    result = {"processor": back, "doc": doc, "qr": qr_result, "is_cnic": is_cnic, "readability": {}, "cnic_qr": None}
+    if not is_cnic:
+        return result
+
+    result["readability"] = back.check_readability()
+    if qr_result.get("success"):
+        result["cnic_qr"] = back.extract_cnic_from_qr_payloads(qr_result.get("payloads", []))
+    return result
+
+
 @router.post("/verify-pair", response_model=PairVerificationResponse)
 async def verify_cnic_pair(
+    background_tasks: BackgroundTasks,
     front_file: UploadFile = File(...),
     back_file: UploadFile = File(...),
     current_user: Any = Depends(get_current_user)
@@ -680,29 +1157,28 @@ async def verify_cnic_pair(
     """Verify CNIC belongs to the same person by matching front OCR CNIC number with the CNIC number embedded in the back-side QR."""
     try:
         for f in [front_file, back_file]:
-            if not f.filename or not f.filename.lower().endswith((".jpg", ".jpeg", ".png")):
+            if not is_allowed_image(f):
                 raise HTTPException(status_code=400, detail="Invalid file format. Please upload JPG or PNG images.")
 
-        front_bytes = await front_file.read()
-        back_bytes = await back_file.read()
-
-        front = CNICProcessor(front_bytes)
-        back = CNICProcessor(back_bytes)
+        front_bytes = await read_upload(front_file)
+        back_bytes = await read_upload(back_file)
 
-        front_doc = front.looks_like_cnic_front()
-        back_doc = back.looks_like_cnic_back()
+        # Front (OCR) and back (QR) are independent images; run both pipelines concurrently
+        front_result, back_result = await asyncio.gather(
+            asyncio.to_thread(process_front, front_bytes),
+            asyncio.to_thread(process_back, back_bytes)
+        )
 
-        # QR presence is a strong back-side signal; use it to avoid false rejects
-        qr_result = back.scan_qr_code()
-        back_is_cnic = bool(back_doc.get("is_cnic")) or bool(qr_result.get("success"))
-        if not front_doc.get("is_cnic"):
+        back = back_result["processor"]
+        qr_result = back_result["qr"]
+        back_is_cnic = back_result["is_cnic"]
+        if not front_result["doc"].get("is_cnic"):
             raise HTTPException(status_code=400, detail="Front image does not look like a Pakistani Computerized CNIC front side.")
         if not back_is_cnic:
             raise HTTPException(status_code=400, detail="Back image does not look like a Pakistani Computerized CNIC back side.")
 
-        front_readability = front.check_readability()
-        back_readability = back.check_readability()
-        if not front_readability.get("is_readable"):
+        back_readability = back_result["readability"]
+        if not front_result["readability"].get("is_readable"):
             return PairVerificationResponse(
                 front_is_readable=False,
                 back_is_readable=bool(back_readability.get("is_readable")),
@@ -715,7 +1191,7 @@ async def verify_cnic_pair(
                 message="Front image is too blurry/low quality. Please upload a clearer CNIC front photo."
             )
 
-        cnic_front = front.extract_cnic_number()
+        cnic_front = front_result["cnic"]
         if not cnic_front:
             return PairVerificationResponse(
                 front_is_readable=True,
@@ -729,8 +1205,7 @@ async def verify_cnic_pair(
                 message="Could not detect CNIC number on the front side. Please upload a clearer front image where the CNIC number is visible."
             )
 
-        dates = front.extract_dates()
-        expiry_info = front.check_expiry(dates)
+        expiry_info = front_result["expiry_info"]
 
         if not qr_result.get("success"):
             return PairVerificationResponse(
@@ -745,7 +1220,7 @@ async def verify_cnic_pair(
                 message="Could not read QR code on the back side. Please upload a clearer back image (QR fully visible, no glare)."
             )
 
-        cnic_qr = back.extract_cnic_from_qr_payloads(qr_result.get("payloads", []))
+        cnic_qr = back_result["cnic_qr"]
         
         if not cnic_qr:
             return PairVerificationResponse(
@@ -762,8 +1237,8 @@ async def verify_cnic_pair(
 
         # Compare digits only (strip dashes) so formatting differences
         # between front OCR and QR extraction don't cause false mismatches.
-        front_digits = re.sub(r"\D", "", cnic_front) if cnic_front else ""
-        qr_digits = re.sub(r"\D", "", cnic_qr) if cnic_qr else ""
+        front_digits = _NON_DIGIT.sub("", cnic_front) if cnic_front else ""
+        qr_digits = _NON_DIGIT.sub("", cnic_qr) if cnic_qr else ""
         cnic_match = (front_digits == qr_digits) and len(front_digits) == 13
 
         # Best-effort DB write (keep current schema assumptions)
@@ -781,23 +1256,22 @@ async def verify_cnic_pair(
             notes.append(expiry_info.get("message", ""))
             notes.append(f"QR CNIC: {back._mask_cnic(cnic_qr) or 'N/A'}")
             
-            # Save to cnic_verification table
-            supabase.table("cnic_verification").insert({
+            row = {
                 "user_id": user_id,
                 "upload_path": f"{front_file.filename} | {back_file.filename}",
                 "extracted_cnic": cnic_front,
-                "extracted_name": front.extract_name(),
+                "extracted_name": front_result["name"],
                 "extracted_dob": None,
                 "status": status,
                 "notes": " | ".join([n for n in notes if n])
-            }).execute()
-            
-            # Update user's profile with CNIC verification status
+            }
             if cnic_match:
-                supabase.table("users").update({
-                    "cnic_verified": True,
-                    "cnic_number": cnic_front
-                }).eq("id", user_id).execute()
+                # Record + profile flag in one transaction; kept inline because
+                # the client reads cnic_verified right after this response
+                await asyncio.to_thread(save_verified_cnic_pair, row)
+            else:
+                # Save to cnic_verification table (after the response is sent)
+                background_tasks.add_task(save_cnic_verification, row)
         except Exception as db_error:
             print(f"Warning: Could not save pair verification to database: {db_error}")
 
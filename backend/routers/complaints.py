@@ -1,11 +1,39 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 from backend.supabase_client import supabase
-from backend.auth import get_current_user
+from backend.auth import get_current_user, get_user_id, require_admin
+from backend.services.cache_service import response_cache
 
 router = APIRouter(prefix="/complaints", tags=["Complaints"])
 
+COMPLAINTS_CACHE_TTL = 120  # seconds
+ALL_COMPLAINTS_CACHE_NAMESPACE = "complaints:all"
+
+
+def all_complaints_cache_key(status: Optional[str], limit: int, page: str) -> str:
+    """One key per admin page under the current list version (read it before querying)"""
+    version = response_cache.get_version(ALL_COMPLAINTS_CACHE_NAMESPACE)
+    return f"{ALL_COMPLAINTS_CACHE_NAMESPACE}:v{version}:{status or ''}:{limit}:{page}"
+
+
+def my_complaints_cache_namespace(user_id: str) -> str:
+    return f"complaints:user:{user_id}"
+
+
+def my_complaints_cache_key(user_id: str) -> str:
+    """A user's complaint list under their current version (read it before querying)"""
+    namespace = my_complaints_cache_namespace(user_id)
+    return f"{namespace}:v{response_cache.get_version(namespace)}"
+
+
+def invalidate_complaints_cache(*user_ids: str):
+    """Drop the admin complaint list and the given users' own complaint lists"""
+    response_cache.bump_version(ALL_COMPLAINTS_CACHE_NAMESPACE)
+    for uid in user_ids:
+        if uid:
+            response_cache.bump_version(my_complaints_cache_namespace(uid))
+
 
 class CreateComplaintRequest(BaseModel):
     complaint_type: str  # photographer_behavior, quality_issues, payment_dispute, other
@@ -13,7 +41,7 @@ class CreateComplaintRequest(BaseModel):
     description: str
     booking_id: Optional[str] = None
     photographer_id: Optional[str] = None
-    evidence_urls: Optional[list] = None
+    evidence_urls: Optional[List[str]] = None
 
 
 class UpdateComplaintRequest(BaseModel):
@@ -23,124 +51,113 @@ class UpdateComplaintRequest(BaseModel):
 
 
 @router.post("/")
-def create_complaint(payload: CreateComplaintRequest, current_user: dict = Depends(get_current_user)):
+def create_complaint(payload: CreateComplaintRequest, user_id: str = Depends(get_user_id)):
     """Create a new complaint"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-
-        complaint = {
-            "user_id": user_id,
-            "complaint_type": payload.complaint_type,
-            "subject": payload.subject,
-            "description": payload.description,
-            "booking_id": payload.booking_id,
-            "photographer_id": payload.photographer_id,
-            "evidence_urls": payload.evidence_urls,
-            "status": "open",
-            "priority": "medium"
-        }
-
-        resp = supabase.table('complaints').insert(complaint).execute()
-        return {"success": True, "data": resp.data}
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    complaint = {
+        "user_id": user_id,
+        "complaint_type": payload.complaint_type,
+        "subject": payload.subject,
+        "description": payload.description,
+        "booking_id": payload.booking_id,
+        "photographer_id": payload.photographer_id,
+        "evidence_urls": payload.evidence_urls,
+        "status": "open",
+        "priority": "medium"
+    }
+
+    resp = supabase.table('complaints').insert(complaint).execute()
+    invalidate_complaints_cache(user_id)
+    return {"success": True, "data": resp.data}
 
 
 @router.get("/my-complaints")
-def get_my_complaints(current_user: dict = Depends(get_current_user)):
+def get_my_complaints(user_id: str = Depends(get_user_id)):
     """Get all complaints filed by current user"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+    cache_key = my_complaints_cache_key(user_id)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return {"success": True, "data": cached}
 
-        resp = supabase.table('complaints').select('*, photographer:photographer_profile(*, user:users(*)), booking:booking(*)').eq('user_id', user_id).order('created_at', desc=True).execute()
-        return {"success": True, "data": resp.data}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    resp = supabase.table('complaints').select(
+        '*, photographer:photographer_profile(id, business_name, user:users(id, full_name)), '
+        'booking:booking(id, event_type, event_date, location, status)'
+    ).eq('user_id', user_id).order('created_at', desc=True).execute()
+    response_cache.set(cache_key, resp.data, COMPLAINTS_CACHE_TTL)
+    return {"success": True, "data": resp.data}
 
 
 @router.get("/{complaint_id}")
-def get_complaint(complaint_id: str, current_user: dict = Depends(get_current_user)):
+def get_complaint(complaint_id: str, user_id: str = Depends(get_user_id), current_user: dict = Depends(get_current_user)):
     """Get specific complaint details"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-
-        # Get user role
-        user = supabase.table('users').select('role').eq('id', user_id).limit(1).execute()
-        is_admin = user.data and user.data[0].get('role') == 'admin'
-
-        resp = supabase.table('complaints').select('*, user:users(*), photographer:photographer_profile(*, user:users(*)), booking:booking(*)').eq('id', complaint_id).limit(1).execute()
-        
-        if not resp.data:
-            raise HTTPException(status_code=404, detail="Complaint not found")
-        
-        # Verify access (user's own complaint or admin)
-        complaint = resp.data[0]
-        if complaint['user_id'] != user_id and not is_admin:
-            raise HTTPException(status_code=403, detail="Unauthorized to view this complaint")
-        
-        return {"success": True, "data": complaint}
-    except HTTPException:
-        raise
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    # Role is already loaded by get_current_user
+    is_admin = current_user.get('role') == 'admin'
+
+    resp = supabase.table('complaints').select(
+        '*, user:users(id, full_name, email), '
+        'photographer:photographer_profile(id, business_name, user:users(id, full_name, email)), '
+        'booking:booking(id, event_type, event_date, location, status)'
+    ).eq('id', complaint_id).limit(1).execute()
+    
+    if not resp.data:
+        raise HTTPException(status_code=404, detail="Complaint not found")
+    
+    # Verify access (user's own complaint or admin)
+    complaint = resp.data[0]
+    if complaint['user_id'] != user_id and not is_admin:
+        raise HTTPException(status_code=403, detail="Unauthorized to view this complaint")
+    
+    return {"success": True, "data": complaint}
 
 
 @router.get("/")
-def get_all_complaints(status: Optional[str] = None, limit: int = 50, offset: int = 0, current_user: dict = Depends(get_current_user)):
-    """Get all complaints (admin only)"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-
-        # Verify admin
-        user = supabase.table('users').select('role').eq('id', user_id).limit(1).execute()
-        if not user.data or user.data[0].get('role') != 'admin':
-            raise HTTPException(status_code=403, detail="Admin access required")
-
-        query = supabase.table('complaints').select('*, user:users(*), photographer:photographer_profile(*)')
-        
+def get_all_complaints(
+    status: Optional[str] = None,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
+    """
+    Get all complaints (admin only), newest first
+
+    Pass the previous page's next_cursor as `cursor` to page by created_at
+    instead of OFFSET, so deep pages cost the same as the first one.
+    """
+    cache_key = all_complaints_cache_key(status, limit, cursor or str(offset))
+    complaints = response_cache.get(cache_key)
+    if complaints is None:
+        query = supabase.table('complaints').select(
+            '*, user:users(id, full_name, email), photographer:photographer_profile(id, business_name)'
+        )
+
         if status:
             query = query.eq('status', status)
-        
-        resp = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
-        return {"success": True, "data": resp.data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+
+        query = query.order('created_at', desc=True)
+        if cursor:
+            resp = query.lt('created_at', cursor).limit(limit).execute()
+        else:
+            resp = query.range(offset, offset + limit - 1).execute()
+
+        complaints = resp.data
+        response_cache.set(cache_key, complaints, COMPLAINTS_CACHE_TTL)
+
+    return {
+        "success": True,
+        "data": complaints,
+        "has_more": len(complaints) == limit,
+        "next_cursor": complaints[-1].get('created_at') if complaints else None
+    }
 
 
 @router.put("/{complaint_id}")
-def update_complaint(complaint_id: str, payload: UpdateComplaintRequest, current_user: dict = Depends(get_current_user)):
+def update_complaint(complaint_id: str, payload: UpdateComplaintRequest, current_user: dict = Depends(require_admin)):
     """Update complaint status (admin only)"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-
-        # Verify admin
-        user = supabase.table('users').select('role').eq('id', user_id).limit(1).execute()
-        if not user.data or user.data[0].get('role') != 'admin':
-            raise HTTPException(status_code=403, detail="Admin access required")
-
-        updates = {}
-        if payload.status is not None:
-            updates['status'] = payload.status
-        if payload.admin_notes is not None:
-            updates['admin_notes'] = payload.admin_notes
-        if payload.resolution is not None:
-            updates['resolution'] = payload.resolution
-
-        resp = supabase.table('complaints').update(updates).eq('id', complaint_id).execute()
-        return {"success": True, "data": resp.data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    # Only the fields the client actually set (None means "leave unchanged")
+    updates = payload.model_dump(exclude_none=True)
+    if not updates:
+        return {"success": True, "data": [], "message": "No changes"}
+
+    resp = supabase.table('complaints').update(updates).eq('id', complaint_id).execute()
+    invalidate_complaints_cache(*[row.get('user_id') for row in resp.data or []])
+    return {"success": True, "data": resp.data}
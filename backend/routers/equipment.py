@@ -1,15 +1,99 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from pydantic import BaseModel
+from postgrest.exceptions import APIError as PostgrestAPIError
+from postgrest.types import ReturnMethod
 from typing import Optional, List
-from datetime import datetime, date
+from datetime import datetime, date, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
 from backend.supabase_client import supabase
-from backend.auth import get_current_user
+from backend.auth import get_user_id, require_admin
 from backend.services.escrow_service import escrow_service
+from backend.services.cache_service import response_cache
+from backend.routers.complaints import invalidate_complaints_cache
 import uuid
+import hashlib
+import orjson
 
 router = APIRouter(prefix="/equipment", tags=["Equipment"])
 
 
+def now_iso() -> str:
+    """Current UTC time as an ISO-8601 string for timestamp columns (e.g. resolved_at)"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+PHOTOGRAPHER_ID_CACHE_TTL = 600  # photographer_profile.id never changes for a user while the profile exists
+
+
+# Cached reads and invalidations go through namespace versions rather than delete():
+# a read that started before a write stores its value under the old version, which
+# nobody reads again, instead of overwriting the invalidation for the whole TTL.
+def photographer_id_cache_namespace(user_id: str) -> str:
+    return f"phot:{user_id}"
+
+
+def photographer_id_cache_key(user_id: str) -> str:
+    namespace = photographer_id_cache_namespace(user_id)
+    return f"{namespace}:v{response_cache.get_version(namespace)}"
+
+
+def get_photographer_id(user_id: str) -> Optional[str]:
+    """photographer_profile.id for a user (cached), or None if they aren't a photographer"""
+    key = photographer_id_cache_key(user_id)
+    photographer_id = response_cache.get(key)
+    if photographer_id:
+        return photographer_id
+
+    photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
+    if not photographer.data:
+        return None  # Not cached, so a newly created profile is picked up immediately
+    photographer_id = photographer.data[0]['id']
+    response_cache.set(key, photographer_id, PHOTOGRAPHER_ID_CACHE_TTL)
+    return photographer_id
+
+
+def invalidate_photographer_id_cache(user_id: str) -> None:
+    """Forget a user's cached photographer_profile.id (call when the profile is deleted)"""
+    response_cache.bump_version(photographer_id_cache_namespace(user_id))
+
+
+EQUIPMENT_CACHE_TTL = 120  # seconds
+PUBLIC_EQUIPMENT_CACHE_CONTROL = "public, max-age=60, stale-while-revalidate=300"
+
+
+def equipment_cache_namespace(photographer_id: str) -> str:
+    """Versions both of a photographer's equipment lists together"""
+    return f"equip:{photographer_id}"
+
+
+def my_equipment_cache_key(photographer_id: str) -> str:
+    version = response_cache.get_version(equipment_cache_namespace(photographer_id))
+    return f"equip:my:{photographer_id}:v{version}"
+
+
+def public_equipment_cache_key(photographer_id: str) -> str:
+    version = response_cache.get_version(equipment_cache_namespace(photographer_id))
+    return f"equip:public:{photographer_id}:v{version}"
+
+
+RENTABLE_EQUIPMENT_CACHE_TTL = 45  # seconds
+RENTABLE_EQUIPMENT_CACHE_NAMESPACE = "equip:rentable"
+
+
+def rentable_equipment_cache_key(category: Optional[str], min_price: Optional[float],
+                                 max_price: Optional[float], limit: int, offset: int) -> str:
+    """One key per filter/page combination, under the current rentable-listing version"""
+    version = response_cache.get_version(RENTABLE_EQUIPMENT_CACHE_NAMESPACE)
+    return f"{RENTABLE_EQUIPMENT_CACHE_NAMESPACE}:v{version}:{category or ''}:{min_price}:{max_price}:{limit}:{offset}"
+
+
+def invalidate_equipment_cache(photographer_id: str) -> None:
+    """Drop a photographer's cached equipment lists (owner view, public profile view) and the rentable listing"""
+    response_cache.bump_version(equipment_cache_namespace(photographer_id))
+    # Every rentable page is keyed by this version, so one bump retires them all
+    response_cache.bump_version(RENTABLE_EQUIPMENT_CACHE_NAMESPACE)
+
+
 class AddEquipmentRequest(BaseModel):
     name: str
     category: str  # camera, lens, lighting, audio, accessory
@@ -30,172 +114,183 @@ class UpdateEquipmentRequest(BaseModel):
     is_active: Optional[bool] = None
 
 
+MAX_BULK_EQUIPMENT = 100  # Rows accepted by one POST /equipment/bulk call
+
+
+def equipment_row(payload: AddEquipmentRequest, photographer_id: str) -> dict:
+    """Insert row for a new, active equipment item"""
+    return {"photographer_id": photographer_id, **payload.model_dump(), "is_active": True}
+
+
 @router.post("/")
-def add_equipment(payload: AddEquipmentRequest, current_user: dict = Depends(get_current_user)):
+def add_equipment(payload: AddEquipmentRequest, user_id: str = Depends(get_user_id)):
     """Add new equipment for photographer"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-
-        # Verify user is a photographer and get photographer_profile.id
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
-            raise HTTPException(status_code=403, detail="Only photographers can add equipment")
-        
-        photographer_id = photographer.data[0]['id']
-
-        equipment = {
-            "photographer_id": photographer_id,
-            "name": payload.name,
-            "category": payload.category,
-            "brand": payload.brand,
-            "model": payload.model,
-            "purchase_date": payload.purchase_date,
-            "condition": payload.condition,
-            "notes": payload.notes,
-            "is_active": True
-        }
+    photographer_id = get_photographer_id(user_id)
+    if not photographer_id:
+        raise HTTPException(status_code=403, detail="Only photographers can add equipment")
 
-        resp = supabase.table('equipment').insert(equipment).execute()
-        return {"success": True, "data": resp.data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    resp = supabase.table('equipment').insert(equipment_row(payload, photographer_id)).execute()
+    invalidate_equipment_cache(photographer_id)
+    return {"success": True, "data": resp.data}
+
+
+@router.post("/bulk")
+def add_equipment_bulk(payload: List[AddEquipmentRequest], user_id: str = Depends(get_user_id)):
+    """Add several equipment items for photographer in a single multi-row insert"""
+    if not payload:
+        raise HTTPException(status_code=400, detail="No equipment provided")
+    if len(payload) > MAX_BULK_EQUIPMENT:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_EQUIPMENT} items per request")
+
+    photographer_id = get_photographer_id(user_id)
+    if not photographer_id:
+        raise HTTPException(status_code=403, detail="Only photographers can add equipment")
+
+    rows = [equipment_row(item, photographer_id) for item in payload]
+    resp = supabase.table('equipment').insert(rows).execute()
+    invalidate_equipment_cache(photographer_id)
+    return {"success": True, "data": resp.data}
 
 
 @router.get("/my-equipment")
-def get_my_equipment(current_user: dict = Depends(get_current_user)):
+def get_my_equipment(user_id: str = Depends(get_user_id)):
     """Get all equipment for current photographer"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+    photographer_id = get_photographer_id(user_id)
+    if not photographer_id:
+        raise HTTPException(status_code=404, detail="Photographer profile not found")
 
-        # Get photographer profile id
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
-            raise HTTPException(status_code=404, detail="Photographer profile not found")
-        
-        photographer_id = photographer.data[0]['id']
+    cache_key = my_equipment_cache_key(photographer_id)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return {"success": True, "data": cached}
 
-        resp = supabase.table('equipment').select('*').eq('photographer_id', photographer_id).order('created_at', desc=True).execute()
-        return {"success": True, "data": resp.data}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+    resp = supabase.table('equipment').select('*').eq('photographer_id', photographer_id).order('created_at', desc=True).execute()
+    response_cache.set(cache_key, resp.data, EQUIPMENT_CACHE_TTL)
+    return {"success": True, "data": resp.data}
 
 
 @router.get("/photographer/{photographer_id}")
-def get_photographer_equipment(photographer_id: str):
-    """Get all active equipment for a specific photographer"""
-    try:
+def get_photographer_equipment(photographer_id: str, request: Request, response: Response):
+    """
+    Get all active equipment for a specific photographer
+
+    Public endpoint, so it is sent with an ETag and Cache-Control; browsers and
+    CDNs revalidate with If-None-Match and get a bodyless 304 when nothing changed.
+    """
+    cache_key = public_equipment_cache_key(photographer_id)
+    equipment = response_cache.get(cache_key)
+    if equipment is None:
         resp = supabase.table('equipment').select('*').eq('photographer_id', photographer_id).eq('is_active', True).order('category').execute()
-        return {"success": True, "data": resp.data}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+        equipment = resp.data
+        response_cache.set(cache_key, equipment, EQUIPMENT_CACHE_TTL)
 
+    etag = '"' + hashlib.blake2b(orjson.dumps(equipment, default=str), digest_size=16).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": PUBLIC_EQUIPMENT_CACHE_CONTROL}
+    # Proxies may weaken the tag (W/"...") or send several, so match any of them
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
 
-@router.get("/{equipment_id}")
-def get_equipment(equipment_id: str, current_user: dict = Depends(get_current_user)):
-    """Get specific equipment details"""
+    response.headers.update(headers)
+    return {"success": True, "data": equipment}
+
+
+@router.get("/rentable")
+def get_all_rentable_equipment(
+    category: Optional[str] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0)
+):
+    """Get all equipment available for rent"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+        # Prices are compared to the paisa, so 1000 and 1000.0001 share a cache entry
+        if min_price is not None:
+            min_price = round(min_price, 2)
+        if max_price is not None:
+            max_price = round(max_price, 2)
 
-        # Get photographer profile id
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
-            raise HTTPException(status_code=404, detail="Photographer profile not found")
-        
-        photographer_id = photographer.data[0]['id']
+        cache_key = rentable_equipment_cache_key(category, min_price, max_price, limit, offset)
+        equipment = response_cache.get(cache_key)
+        if equipment is not None:
+            return {"success": True, "data": equipment, "count": len(equipment)}
 
-        resp = supabase.table('equipment').select('*').eq('id', equipment_id).limit(1).execute()
-        if not resp.data:
-            raise HTTPException(status_code=404, detail="Equipment not found")
+        query = supabase.table('equipment').select(
+            '*, photographer_profile!equipment_photographer_id_fkey(id, business_name, city, users!photographer_profile_user_id_fkey(full_name))'
+        ).eq('available', True).eq('is_active', True).gt('rental_price_per_day', 0)
         
-        # Verify ownership
-        if resp.data[0]['photographer_id'] != photographer_id:
-            raise HTTPException(status_code=403, detail="Unauthorized to view this equipment")
+        if category:
+            query = query.eq('category', category)
+        if min_price is not None:
+            query = query.gte('rental_price_per_day', min_price)
+        if max_price is not None:
+            query = query.lte('rental_price_per_day', max_price)
         
-        return {"success": True, "data": resp.data[0]}
-    except HTTPException:
-        raise
+        resp = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
+        response_cache.set(cache_key, resp.data, RENTABLE_EQUIPMENT_CACHE_TTL)
+        return {"success": True, "data": resp.data, "count": len(resp.data)}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
 
-@router.put("/{equipment_id}")
-def update_equipment(equipment_id: str, payload: UpdateEquipmentRequest, current_user: dict = Depends(get_current_user)):
-    """Update equipment details"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+@router.get("/{equipment_id}")
+def get_equipment(equipment_id: str, user_id: str = Depends(get_user_id)):
+    """Get specific equipment details"""
+    # Fetch and verify ownership in one query (inner join on the owner's profile)
+    resp = supabase.table('equipment').select(
+        '*, photographer_profile!equipment_photographer_id_fkey!inner(user_id)'
+    ).eq('id', equipment_id).eq('photographer_profile.user_id', user_id).limit(1).execute()
+    if not resp.data:
+        raise HTTPException(status_code=404, detail="Equipment not found or unauthorized")
+    
+    equipment = resp.data[0]
+    equipment.pop('photographer_profile', None)
+    return {"success": True, "data": equipment}
 
-        # Get photographer profile id
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
-            raise HTTPException(status_code=404, detail="Photographer profile not found")
-        
-        photographer_id = photographer.data[0]['id']
 
-        # Verify ownership
-        equipment = supabase.table('equipment').select('*').eq('id', equipment_id).eq('photographer_id', photographer_id).limit(1).execute()
-        if not equipment.data:
+@router.put("/{equipment_id}")
+def update_equipment(equipment_id: str, payload: UpdateEquipmentRequest, user_id: str = Depends(get_user_id)):
+    """Update equipment details"""
+    photographer_id = get_photographer_id(user_id)
+    if not photographer_id:
+        raise HTTPException(status_code=404, detail="Photographer profile not found")
+
+    # Only the fields the client actually set (None means "leave unchanged")
+    updates = payload.model_dump(exclude_none=True)
+    if not updates:
+        # Nothing to write or invalidate; the owner's cached list (if any) still answers ownership
+        owned = response_cache.get(my_equipment_cache_key(photographer_id))
+        if owned is None:
+            return {"success": True, "data": [], "message": "No changes"}
+        data = [item for item in owned if item.get('id') == equipment_id]
+        if not data:
             raise HTTPException(status_code=404, detail="Equipment not found or unauthorized")
+        return {"success": True, "data": data, "message": "No changes"}
 
-        updates = {}
-        if payload.name is not None:
-            updates['name'] = payload.name
-        if payload.category is not None:
-            updates['category'] = payload.category
-        if payload.brand is not None:
-            updates['brand'] = payload.brand
-        if payload.model is not None:
-            updates['model'] = payload.model
-        if payload.condition is not None:
-            updates['condition'] = payload.condition
-        if payload.notes is not None:
-            updates['notes'] = payload.notes
-        if payload.is_active is not None:
-            updates['is_active'] = payload.is_active
-
-        resp = supabase.table('equipment').update(updates).eq('id', equipment_id).execute()
-        return {"success": True, "data": resp.data}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    # Ownership is part of the filter, so the update returns no rows for someone else's equipment
+    resp = supabase.table('equipment').update(updates).eq('id', equipment_id).eq('photographer_id', photographer_id).execute()
+    if not resp.data:
+        raise HTTPException(status_code=404, detail="Equipment not found or unauthorized")
+
+    invalidate_equipment_cache(photographer_id)
+    return {"success": True, "data": resp.data}
 
 
 @router.delete("/{equipment_id}")
-def delete_equipment(equipment_id: str, current_user: dict = Depends(get_current_user)):
+def delete_equipment(equipment_id: str, user_id: str = Depends(get_user_id)):
     """Delete equipment"""
-    try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+    photographer_id = get_photographer_id(user_id)
+    if not photographer_id:
+        raise HTTPException(status_code=404, detail="Photographer profile not found")
 
-        # Get photographer profile id
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
-            raise HTTPException(status_code=404, detail="Photographer profile not found")
-        
-        photographer_id = photographer.data[0]['id']
+    # Ownership is part of the filter; the deleted rows come back in the response
+    resp = supabase.table('equipment').delete().eq('id', equipment_id).eq('photographer_id', photographer_id).execute()
+    if not resp.data:
+        raise HTTPException(status_code=404, detail="Equipment not found or unauthorized")
 
-        # Verify ownership
-        equipment = supabase.table('equipment').select('*').eq('id', equipment_id).eq('photographer_id', photographer_id).limit(1).execute()
-        if not equipment.data:
-            raise HTTPException(status_code=404, detail="Equipment not found or unauthorized")
-
-        resp = supabase.table('equipment').delete().eq('id', equipment_id).execute()
-        return {"success": True, "message": "Equipment deleted"}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    invalidate_equipment_cache(photographer_id)
+    return {"success": True, "message": "Equipment deleted"}
 
 
 # ================================
@@ -224,31 +319,89 @@ class DisputeRentalRequest(BaseModel):
     description: str
 
 
-@router.get("/rentable")
-def get_all_rentable_equipment(
-    category: Optional[str] = None,
-    min_price: Optional[float] = None,
-    max_price: Optional[float] = None,
-    limit: int = 50,
-    offset: int = 0
-):
-    """Get all equipment available for rent"""
+RENTAL_OVERLAP_SQLSTATE = "23P01"  # exclusion_violation from equipment_rental_no_overlap
+
+# Runs the rental conflict lookup alongside the equipment fetch in create_rental_request.
+# Bounded so a burst of requests queues here instead of opening unlimited DB connections.
+_rental_read_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rental-read")
+
+
+def find_rental_conflict(equipment_id: str, start_date: str, end_date: str) -> list:
+    """Open rentals of the equipment overlapping start_date..end_date (inclusive), at most one row"""
+    return supabase.table('equipment_rental').select('id').eq(
+        'equipment_id', equipment_id
+    ).in_('status', ['requested', 'approved', 'active']).lte(
+        'start_date', end_date
+    ).gte('end_date', start_date).limit(1).execute().data
+
+
+def update_owned_rental(rental_id: str, owner_id: str, updates: dict, **expected) -> list:
+    """
+    Conditionally update an owner's rental in one round trip.
+    Returns the updated rows; empty when the rental is missing, not theirs,
+    or doesn't match the expected column values (e.g. status='requested').
+    """
+    query = supabase.table('equipment_rental').update(updates).eq('id', rental_id).eq('owner_id', owner_id)
+    for column, value in expected.items():
+        query = query.eq(column, value)
+    return query.execute().data
+
+
+def get_owned_rental_state(rental_id: str, owner_id: str) -> dict:
+    """status/payment_status of an owner's rental, used to explain a failed conditional update"""
+    rental = supabase.table('equipment_rental').select('status, payment_status').eq('id', rental_id).eq('owner_id', owner_id).limit(1).execute()
+    if not rental.data:
+        raise HTTPException(status_code=404, detail="Rental not found or unauthorized")
+    return rental.data[0]
+
+
+def save_rental_dispute(dispute: dict, rental_id: str, rental_notes: str) -> list:
+    """Insert the dispute complaint and note it on the rental; returns the inserted complaint rows"""
+    # Use database function: one round trip, both writes in a single transaction
     try:
-        query = supabase.table('equipment').select(
-            '*, photographer_profile!equipment_photographer_id_fkey(id, business_name, city, users!photographer_profile_user_id_fkey(full_name))'
-        ).eq('available', True).eq('is_active', True).gt('rental_price_per_day', 0)
-        
-        if category:
-            query = query.eq('category', category)
-        if min_price is not None:
-            query = query.gte('rental_price_per_day', min_price)
-        if max_price is not None:
-            query = query.lte('rental_price_per_day', max_price)
-        
-        resp = query.order('created_at', desc=True).range(offset, offset + limit - 1).execute()
-        return {"success": True, "data": resp.data, "count": len(resp.data)}
-    except Exception as e:
-        return {"success": False, "error": str(e)}
+        return supabase.rpc('create_rental_dispute', {
+            "p_user_id": dispute["user_id"],
+            "p_photographer_id": dispute["photographer_id"],
+            "p_subject": dispute["subject"],
+            "p_description": dispute["description"],
+            "p_rental_id": rental_id,
+            "p_rental_notes": rental_notes,
+        }).execute().data
+    except Exception as rpc_error:
+        print(f"Warning: create_rental_dispute RPC not available, using fallback writes: {rpc_error}")
+
+    # Fallback: two separate writes
+    resp = supabase.table('complaints').insert(dispute).execute()
+    supabase.table('equipment_rental').update({
+        "notes": rental_notes
+    }, returning=ReturnMethod.minimal).eq('id', rental_id).execute()
+    return resp.data
+
+
+def save_dispute_resolution(dispute_id: str, resolution: str, rental_id: Optional[str], rental_notes: str) -> list:
+    """Mark the dispute resolved and note the outcome on its rental; returns the updated complaint rows"""
+    # Use database function: one round trip, both writes in a single transaction
+    try:
+        return supabase.rpc('resolve_rental_dispute', {
+            "p_dispute_id": dispute_id,
+            "p_resolution": resolution,
+            "p_rental_id": rental_id,
+            "p_rental_notes": rental_notes,
+        }).execute().data
+    except Exception as rpc_error:
+        print(f"Warning: resolve_rental_dispute RPC not available, using fallback writes: {rpc_error}")
+
+    # Fallback: two separate writes
+    resp = supabase.table('complaints').update({
+        "status": "resolved",
+        "resolution": resolution,
+        "resolved_at": now_iso()
+    }).eq('id', dispute_id).execute()
+    if rental_id:
+        supabase.table('equipment_rental').update({
+            "notes": rental_notes
+        }, returning=ReturnMethod.minimal).eq('id', rental_id).execute()
+    return resp.data
 
 
 @router.get("/{equipment_id}/availability")
@@ -268,33 +421,31 @@ def get_equipment_availability(equipment_id: str, month: Optional[int] = None, y
             next_month_year = target_year
             next_month = target_month + 1
         
-        start_date = f"{target_year}-{target_month:02d}-01"
-        end_date = f"{next_month_year}-{next_month:02d}-01"
+        month_start = date(target_year, target_month, 1)
+        month_end = date(next_month_year, next_month, 1) - timedelta(days=1)
         
         # Get all rentals that overlap with this month
         rentals = supabase.table('equipment_rental').select(
             'id, start_date, end_date, status, renter_id, users!equipment_rental_renter_id_fkey(full_name)'
         ).eq('equipment_id', equipment_id).in_(
             'status', ['requested', 'approved', 'active']
-        ).or_(
-            f'and(start_date.lte.{end_date},end_date.gte.{start_date})'
-        ).execute()
+        ).lte('start_date', month_end.isoformat()).gte('end_date', month_start.isoformat()).execute()
         
         blocked_dates = []
         for rental in rentals.data:
-            # Generate all dates in the rental period
-            rental_start = datetime.strptime(rental['start_date'], '%Y-%m-%d').date()
-            rental_end = datetime.strptime(rental['end_date'], '%Y-%m-%d').date()
-            current = rental_start
-            while current <= rental_end:
-                blocked_dates.append({
-                    "date": current.isoformat(),
+            # Generate the rental's dates, clipped to the requested month
+            rental_start = date.fromisoformat(rental['start_date'])
+            rental_end = date.fromisoformat(rental['end_date'])
+            first = max(rental_start, month_start)
+            last = min(rental_end, month_end)
+            blocked_dates.extend(
+                {
+                    "date": (first + timedelta(days=offset)).isoformat(),
                     "status": rental['status'],
                     "rental_id": rental['id']
-                })
-                current = date(current.year, current.month, current.day + 1) if current.day < 28 else (
-                    date(current.year, current.month + 1, 1) if current.month < 12 else date(current.year + 1, 1, 1)
-                )
+                }
+                for offset in range((last - first).days + 1)
+            )
         
         return {
             "success": True, 
@@ -309,12 +460,19 @@ def get_equipment_availability(equipment_id: str, month: Optional[int] = None, y
 
 
 @router.post("/rentals")
-def create_rental_request(payload: CreateRentalRequest, current_user: dict = Depends(get_current_user)):
+def create_rental_request(payload: CreateRentalRequest, user_id: str = Depends(get_user_id)):
     """Create a new equipment rental request"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
+        start = date.fromisoformat(payload.start_date)
+        end = date.fromisoformat(payload.end_date)
+        if end < start:
+            raise HTTPException(status_code=400, detail="End date must be on or after start date")
+        
+        # The date-conflict check (kept for databases without the overlap constraint) doesn't
+        # depend on the equipment row, so both reads run concurrently: one round trip of latency
+        conflicts = _rental_read_executor.submit(
+            find_rental_conflict, payload.equipment_id, payload.start_date, payload.end_date
+        )
         
         # Get equipment details
         equipment = supabase.table('equipment').select(
@@ -329,19 +487,10 @@ def create_rental_request(payload: CreateRentalRequest, current_user: dict = Dep
         if not equip.get('available') or not equip.get('is_active'):
             raise HTTPException(status_code=400, detail="Equipment is not available for rent")
         
-        # Check for date conflicts
-        conflicts = supabase.table('equipment_rental').select('id').eq(
-            'equipment_id', payload.equipment_id
-        ).in_('status', ['requested', 'approved', 'active']).or_(
-            f'and(start_date.lte.{payload.end_date},end_date.gte.{payload.start_date})'
-        ).execute()
-        
-        if conflicts.data:
+        if conflicts.result():
             raise HTTPException(status_code=400, detail="Equipment is not available for these dates")
         
         # Calculate rental details
-        start = datetime.strptime(payload.start_date, '%Y-%m-%d')
-        end = datetime.strptime(payload.end_date, '%Y-%m-%d')
         total_days = (end - start).days + 1
         rental_price = equip['rental_price_per_day'] * total_days
         security_deposit = rental_price * 0.5  # 50% security deposit
@@ -362,7 +511,13 @@ def create_rental_request(payload: CreateRentalRequest, current_user: dict = Dep
             "notes": payload.notes
         }
         
-        resp = supabase.table('equipment_rental').insert(rental).execute()
+        # equipment_rental_no_overlap catches a concurrent request that passed the check above
+        try:
+            resp = supabase.table('equipment_rental').insert(rental).execute()
+        except PostgrestAPIError as e:
+            if e.code == RENTAL_OVERLAP_SQLSTATE:
+                raise HTTPException(status_code=400, detail="Equipment is not available for these dates")
+            raise
         
         # TODO: Send notification to equipment owner
         
@@ -381,16 +536,13 @@ def create_rental_request(payload: CreateRentalRequest, current_user: dict = Dep
 @router.get("/rentals/my")
 def get_my_rentals(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    user_id: str = Depends(get_user_id)
 ):
     """Get all rentals for current user (as renter)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         query = supabase.table('equipment_rental').select(
-            '*, equipment!equipment_rental_equipment_id_fkey(*, photographer_profile!equipment_photographer_id_fkey(user_id, business_name, city))'
+            '*, equipment!equipment_rental_equipment_id_fkey(id, name, category, brand, model, '
+            'photographer_profile!equipment_photographer_id_fkey(user_id, business_name, city))'
         ).eq('renter_id', user_id)
         
         if status:
@@ -405,23 +557,17 @@ def get_my_rentals(
 @router.get("/rentals/owner")
 def get_owner_rental_requests(
     status: Optional[str] = None,
-    current_user: dict = Depends(get_current_user)
+    user_id: str = Depends(get_user_id)
 ):
     """Get all rental requests for equipment owned by current user"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
-        # Get photographer profile
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
+        owner_id = get_photographer_id(user_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Photographer profile not found")
         
-        owner_id = photographer.data[0]['id']
-        
         query = supabase.table('equipment_rental').select(
-            '*, equipment!equipment_rental_equipment_id_fkey(*), users!equipment_rental_renter_id_fkey(full_name, email, phone)'
+            '*, equipment!equipment_rental_equipment_id_fkey(id, name, category, brand, model), '
+            'users!equipment_rental_renter_id_fkey(full_name, email, phone)'
         ).eq('owner_id', owner_id)
         
         if status:
@@ -434,13 +580,9 @@ def get_owner_rental_requests(
 
 
 @router.get("/rentals/{rental_id}")
-def get_rental_details(rental_id: str, current_user: dict = Depends(get_current_user)):
+def get_rental_details(rental_id: str, user_id: str = Depends(get_user_id)):
     """Get specific rental details"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         resp = supabase.table('equipment_rental').select(
             '*, equipment!equipment_rental_equipment_id_fkey(*, photographer_profile!equipment_photographer_id_fkey(id, user_id, business_name)), users!equipment_rental_renter_id_fkey(full_name, email, phone)'
         ).eq('id', rental_id).limit(1).execute()
@@ -463,37 +605,24 @@ def get_rental_details(rental_id: str, current_user: dict = Depends(get_current_
 
 
 @router.put("/rentals/{rental_id}/approve")
-def approve_rental(rental_id: str, current_user: dict = Depends(get_current_user)):
+def approve_rental(rental_id: str, user_id: str = Depends(get_user_id)):
     """Approve a rental request (owner only)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
-        # Get photographer profile
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
+        owner_id = get_photographer_id(user_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Photographer profile not found")
         
-        owner_id = photographer.data[0]['id']
-        
-        # Get rental and verify ownership
-        rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('owner_id', owner_id).limit(1).execute()
-        if not rental.data:
-            raise HTTPException(status_code=404, detail="Rental not found or unauthorized")
-        
-        if rental.data[0]['status'] != 'requested':
-            raise HTTPException(status_code=400, detail=f"Cannot approve rental with status: {rental.data[0]['status']}")
-        
-        # Update status
-        resp = supabase.table('equipment_rental').update({
-            "status": "approved",
-            "updated_at": datetime.now().isoformat()
-        }).eq('id', rental_id).execute()
+        # Status precondition and ownership are part of the filter, so concurrent approvals can't both win
+        updated = update_owned_rental(rental_id, owner_id, {
+            "status": "approved"
+        }, status='requested')
+        if not updated:
+            rental = get_owned_rental_state(rental_id, owner_id)
+            raise HTTPException(status_code=400, detail=f"Cannot approve rental with status: {rental['status']}")
         
         # TODO: Send notification to renter about approval
         
-        return {"success": True, "data": resp.data, "message": "Rental request approved"}
+        return {"success": True, "data": updated, "message": "Rental request approved"}
     except HTTPException:
         raise
     except Exception as e:
@@ -501,38 +630,25 @@ def approve_rental(rental_id: str, current_user: dict = Depends(get_current_user
 
 
 @router.put("/rentals/{rental_id}/reject")
-def reject_rental(rental_id: str, payload: UpdateRentalStatusRequest, current_user: dict = Depends(get_current_user)):
+def reject_rental(rental_id: str, payload: UpdateRentalStatusRequest, user_id: str = Depends(get_user_id)):
     """Reject a rental request (owner only)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
-        # Get photographer profile
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
+        owner_id = get_photographer_id(user_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Photographer profile not found")
         
-        owner_id = photographer.data[0]['id']
-        
-        # Get rental and verify ownership
-        rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('owner_id', owner_id).limit(1).execute()
-        if not rental.data:
-            raise HTTPException(status_code=404, detail="Rental not found or unauthorized")
-        
-        if rental.data[0]['status'] != 'requested':
-            raise HTTPException(status_code=400, detail=f"Cannot reject rental with status: {rental.data[0]['status']}")
-        
-        # Update status
-        resp = supabase.table('equipment_rental').update({
+        # Status precondition and ownership are part of the filter
+        updated = update_owned_rental(rental_id, owner_id, {
             "status": "cancelled",
-            "notes": payload.notes or "Rejected by owner",
-            "updated_at": datetime.now().isoformat()
-        }).eq('id', rental_id).execute()
+            "notes": payload.notes or "Rejected by owner"
+        }, status='requested')
+        if not updated:
+            rental = get_owned_rental_state(rental_id, owner_id)
+            raise HTTPException(status_code=400, detail=f"Cannot reject rental with status: {rental['status']}")
         
         # TODO: Send notification to renter about rejection
         
-        return {"success": True, "data": resp.data, "message": "Rental request rejected"}
+        return {"success": True, "data": updated, "message": "Rental request rejected"}
     except HTTPException:
         raise
     except Exception as e:
@@ -540,38 +656,24 @@ def reject_rental(rental_id: str, payload: UpdateRentalStatusRequest, current_us
 
 
 @router.put("/rentals/{rental_id}/activate")
-def activate_rental(rental_id: str, current_user: dict = Depends(get_current_user)):
+def activate_rental(rental_id: str, user_id: str = Depends(get_user_id)):
     """Mark rental as active when equipment is picked up (owner only)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
-        # Get photographer profile
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
+        owner_id = get_photographer_id(user_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Photographer profile not found")
         
-        owner_id = photographer.data[0]['id']
-        
-        # Get rental and verify ownership
-        rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('owner_id', owner_id).limit(1).execute()
-        if not rental.data:
-            raise HTTPException(status_code=404, detail="Rental not found or unauthorized")
-        
-        if rental.data[0]['status'] != 'approved':
-            raise HTTPException(status_code=400, detail="Rental must be approved before activation")
-        
-        if rental.data[0]['payment_status'] != 'paid':
+        # Status/payment preconditions and ownership are part of the filter
+        updated = update_owned_rental(rental_id, owner_id, {
+            "status": "active"
+        }, status='approved', payment_status='paid')
+        if not updated:
+            rental = get_owned_rental_state(rental_id, owner_id)
+            if rental['status'] != 'approved':
+                raise HTTPException(status_code=400, detail="Rental must be approved before activation")
             raise HTTPException(status_code=400, detail="Payment must be completed before activation")
         
-        # Update status
-        resp = supabase.table('equipment_rental').update({
-            "status": "active",
-            "updated_at": datetime.now().isoformat()
-        }).eq('id', rental_id).execute()
-        
-        return {"success": True, "data": resp.data, "message": "Rental is now active"}
+        return {"success": True, "data": updated, "message": "Rental is now active"}
     except HTTPException:
         raise
     except Exception as e:
@@ -582,21 +684,14 @@ def activate_rental(rental_id: str, current_user: dict = Depends(get_current_use
 def return_equipment(
     rental_id: str, 
     payload: ReleaseDepositRequest,
-    current_user: dict = Depends(get_current_user)
+    user_id: str = Depends(get_user_id)
 ):
     """Mark equipment as returned and release deposit (owner only)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
-        # Get photographer profile
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        if not photographer.data:
+        owner_id = get_photographer_id(user_id)
+        if not owner_id:
             raise HTTPException(status_code=404, detail="Photographer profile not found")
         
-        owner_id = photographer.data[0]['id']
-        
         # Get rental and verify ownership
         rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('owner_id', owner_id).limit(1).execute()
         if not rental.data:
@@ -615,8 +710,7 @@ def return_equipment(
         # Update status
         resp = supabase.table('equipment_rental').update({
             "status": "returned",
-            "notes": f"Returned. Deposit: Rs.{deposit}, Deduction: Rs.{deduction}, Refund: Rs.{refund_amount}. {payload.reason}",
-            "updated_at": datetime.now().isoformat()
+            "notes": f"Returned. Deposit: Rs.{deposit}, Deduction: Rs.{deduction}, Refund: Rs.{refund_amount}. {payload.reason}"
         }).eq('id', rental_id).execute()
         
         # Release deposit via escrow service
@@ -639,14 +733,10 @@ def return_equipment(
 def create_rental_dispute(
     rental_id: str,
     payload: DisputeRentalRequest,
-    current_user: dict = Depends(get_current_user)
+    user_id: str = Depends(get_user_id)
 ):
     """Create a dispute for an equipment rental"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         # Get rental
         rental = supabase.table('equipment_rental').select(
             '*, equipment!equipment_rental_equipment_id_fkey(name, photographer_profile!equipment_photographer_id_fkey(id, user_id))'
@@ -666,6 +756,7 @@ def create_rental_dispute(
         dispute = {
             "user_id": user_id,
             "booking_id": None,  # Not a booking
+            "rental_id": rental_id,
             "photographer_id": rental_data['equipment']['photographer_profile']['id'],
             "subject": f"Equipment Rental Dispute: {rental_data['equipment']['name']}",
             "description": f"Rental ID: {rental_id}\nReason: {payload.dispute_reason}\n\n{payload.description}",
@@ -674,15 +765,11 @@ def create_rental_dispute(
             "status": "open"
         }
         
-        resp = supabase.table('complaints').insert(dispute).execute()
-        
-        # Update rental status to indicate dispute
-        supabase.table('equipment_rental').update({
-            "notes": f"DISPUTE RAISED: {payload.dispute_reason}",
-            "updated_at": datetime.now().isoformat()
-        }).eq('id', rental_id).execute()
+        # Insert the dispute and flag the rental together
+        data = save_rental_dispute(dispute, rental_id, f"DISPUTE RAISED: {payload.dispute_reason}")
+        invalidate_complaints_cache(user_id)
         
-        return {"success": True, "data": resp.data, "message": "Dispute submitted. Admin will review within 24-48 hours."}
+        return {"success": True, "data": data, "message": "Dispute submitted. Admin will review within 24-48 hours."}
     except HTTPException:
         raise
     except Exception as e:
@@ -690,13 +777,9 @@ def create_rental_dispute(
 
 
 @router.post("/rentals/{rental_id}/pay")
-def process_rental_payment(rental_id: str, current_user: dict = Depends(get_current_user)):
+def process_rental_payment(rental_id: str, user_id: str = Depends(get_user_id)):
     """Process payment for an approved rental (creates Stripe payment intent)"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         # Get rental
         rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('renter_id', user_id).limit(1).execute()
         
@@ -739,13 +822,9 @@ def process_rental_payment(rental_id: str, current_user: dict = Depends(get_curr
 
 
 @router.post("/rentals/{rental_id}/confirm-payment")
-def confirm_rental_payment(rental_id: str, current_user: dict = Depends(get_current_user)):
+def confirm_rental_payment(rental_id: str, user_id: str = Depends(get_user_id)):
     """Confirm payment completion for a rental"""
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         # Get rental
         rental = supabase.table('equipment_rental').select('*').eq('id', rental_id).eq('renter_id', user_id).limit(1).execute()
         
@@ -759,8 +838,7 @@ def confirm_rental_payment(rental_id: str, current_user: dict = Depends(get_curr
         
         # Update payment status
         resp = supabase.table('equipment_rental').update({
-            "payment_status": "paid",
-            "updated_at": datetime.now().isoformat()
+            "payment_status": "paid"
         }).eq('id', rental_id).execute()
         
         # Create escrow transaction
@@ -789,7 +867,7 @@ class CancelRentalRequest(BaseModel):
 def cancel_rental(
     rental_id: str,
     payload: CancelRentalRequest,
-    current_user: dict = Depends(get_current_user)
+    user_id: str = Depends(get_user_id)
 ):
     """
     Cancel an equipment rental with refund policy
@@ -800,10 +878,6 @@ def cancel_rental(
     - Less than 7 days: No refund
     """
     try:
-        user_id = current_user.get("id") or current_user.get("sub")
-        if not user_id:
-            raise HTTPException(status_code=401, detail="Unauthorized")
-        
         # Get rental
         rental = supabase.table('equipment_rental').select(
             '*, equipment!equipment_rental_equipment_id_fkey(name)'
@@ -815,8 +889,7 @@ def cancel_rental(
         rental_data = rental.data[0]
         
         # Get photographer profile for owner check
-        photographer = supabase.table('photographer_profile').select('id').eq('user_id', user_id).limit(1).execute()
-        owner_id = photographer.data[0]['id'] if photographer.data else None
+        owner_id = get_photographer_id(user_id)
         
         # Verify user is part of this rental
         is_renter = rental_data['renter_id'] == user_id
@@ -834,7 +907,7 @@ def cancel_rental(
         
         if rental_data['payment_status'] == 'paid':
             # Calculate days until rental start
-            start_date = datetime.strptime(rental_data['start_date'], '%Y-%m-%d')
+            start_date = datetime.fromisoformat(rental_data['start_date'])
             now = datetime.now()
             days_until_start = (start_date - now).days
             
@@ -874,8 +947,7 @@ def cancel_rental(
         
         resp = supabase.table('equipment_rental').update({
             "status": "cancelled",
-            "notes": cancellation_note,
-            "updated_at": datetime.now().isoformat()
+            "notes": cancellation_note
         }).eq('id', rental_id).execute()
         
         return {
@@ -894,25 +966,12 @@ def cancel_rental(
 # ADMIN RENTAL ENDPOINTS
 # ================================
 
-def verify_admin(current_user: dict = Depends(get_current_user)):
-    """Verify user is an admin"""
-    user_id = current_user.get("id") or current_user.get("sub")
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Unauthorized")
-    
-    user = supabase.table('users').select('role').eq('id', user_id).limit(1).execute()
-    if not user.data or user.data[0].get('role') != 'admin':
-        raise HTTPException(status_code=403, detail="Admin access required")
-    
-    return current_user
-
-
 @router.get("/admin/rentals")
 def admin_get_all_rentals(
     status: Optional[str] = None,
     limit: int = 50,
     offset: int = 0,
-    current_user: dict = Depends(verify_admin)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all rentals (admin only)"""
     try:
@@ -933,7 +992,7 @@ def admin_get_all_rentals(
 @router.get("/admin/disputes")
 def admin_get_rental_disputes(
     status: Optional[str] = None,
-    current_user: dict = Depends(verify_admin)
+    current_user: dict = Depends(require_admin)
 ):
     """Get all equipment rental disputes (admin only)"""
     try:
@@ -961,7 +1020,7 @@ class ResolveDisputeRequest(BaseModel):
 def admin_resolve_dispute(
     dispute_id: str,
     payload: ResolveDisputeRequest,
-    current_user: dict = Depends(verify_admin)
+    current_user: dict = Depends(require_admin)
 ):
     """Resolve an equipment rental dispute (admin only)"""
     try:
@@ -975,31 +1034,24 @@ def admin_resolve_dispute(
         if dispute_data['status'] == 'resolved':
             raise HTTPException(status_code=400, detail="Dispute is already resolved")
         
-        # Extract rental_id from description (format: "Rental ID: xxx")
-        description = dispute_data.get('description', '')
-        rental_id = None
-        if 'Rental ID:' in description:
-            rental_id = description.split('Rental ID:')[1].split('\n')[0].strip()
-        
-        # Update dispute status
-        resp = supabase.table('complaints').update({
-            "status": "resolved",
-            "resolution": f"{payload.resolution}\nDeposit Action: {payload.deposit_action}" + 
-                         (f"\nRefund Amount: Rs.{payload.refund_amount}" if payload.refund_amount else "") +
-                         (f"\nAdmin Notes: {payload.notes}" if payload.notes else ""),
-            "resolved_at": datetime.now().isoformat()
-        }).eq('id', dispute_id).execute()
-        
-        # If rental_id found, update rental notes
-        if rental_id:
-            supabase.table('equipment_rental').update({
-                "notes": f"DISPUTE RESOLVED: {payload.deposit_action}. {payload.resolution}",
-                "updated_at": datetime.now().isoformat()
-            }).eq('id', rental_id).execute()
+        rental_id = dispute_data.get('rental_id')
+        
+        # Resolve the dispute and note the outcome on the rental (if found) together
+        resolution_lines = [payload.resolution, f"Deposit Action: {payload.deposit_action}"]
+        if payload.refund_amount is not None:
+            resolution_lines.append(f"Refund Amount: Rs.{payload.refund_amount:.2f}")
+        if payload.notes:
+            resolution_lines.append(f"Admin Notes: {payload.notes}")
+        resolution = "\n".join(resolution_lines)
+        data = save_dispute_resolution(
+            dispute_id, resolution, rental_id,
+            f"DISPUTE RESOLVED: {payload.deposit_action}. {payload.resolution}"
+        )
+        invalidate_complaints_cache(dispute_data.get('user_id'))
         
         return {
             "success": True, 
-            "data": resp.data, 
+            "data": data, 
             "message": f"Dispute resolved with {payload.deposit_action}"
         }
     except HTTPException:
@@ -3,7 +3,7 @@ from typing import Optional, List
 import os
 import sys
 from pathlib import Path
-import requests
+import httpx
 import random
 from datetime import datetime, timedelta
 from collections import Counter
@@ -38,6 +38,18 @@ router = APIRouter(prefix="/music", tags=["Music"])
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID", "")
 SPOTIFY_CLIENT_SECRET = os.getenv("SPOTIFY_CLIENT_SECRET", "")
 
+# Shared async HTTP client for Spotify Web API calls (closed by main.py's lifespan on shutdown)
+SPOTIFY_HTTP_TIMEOUT = 10  # seconds
+_spotify_http_options = dict(
+    timeout=SPOTIFY_HTTP_TIMEOUT,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50)
+)
+try:
+    spotify_http = httpx.AsyncClient(http2=True, **_spotify_http_options)
+except ImportError:
+    print("⚠️  h2 not installed - Spotify client falling back to HTTP/1.1")
+    spotify_http = httpx.AsyncClient(**_spotify_http_options)
+
 # Cache for Spotify token
 spotify_token_cache = {
     "token": None,
@@ -82,7 +94,7 @@ EXCLUDE_KEYWORDS = {
 }
 
 
-def get_spotify_token():
+async def get_spotify_token():
     """Get Spotify access token using client credentials flow"""
     # Check if cached token is still valid
     if spotify_token_cache["token"] and spotify_token_cache["expires_at"]:
@@ -91,7 +103,7 @@ def get_spotify_token():
     
     # Get new token
     auth_url = "https://accounts.spotify.com/api/token"
-    auth_response = requests.post(auth_url, {
+    auth_response = await spotify_http.post(auth_url, data={
         'grant_type': 'client_credentials',
         'client_id': SPOTIFY_CLIENT_ID,
         'client_secret': SPOTIFY_CLIENT_SECRET,
@@ -111,7 +123,7 @@ def get_spotify_token():
     return token
 
 
-def get_audio_features(track_ids: list, headers: dict):
+async def get_audio_features(track_ids: list, headers: dict):
     """Fetch audio features for multiple tracks"""
     if not track_ids:
         return {}
@@ -123,7 +135,7 @@ def get_audio_features(track_ids: list, headers: dict):
     features_url = f"https://api.spotify.com/v1/audio-features"
     params = {"ids": ids_param}
     
-    response = requests.get(features_url, headers=headers, params=params)
+    response = await spotify_http.get(features_url, headers=headers, params=params)
     
     if response.status_code != 200:
         return {}
@@ -216,7 +228,7 @@ def calculate_search_relevance(track_title: str, track_artist: str, track_album:
     return score
 
 
-def fetch_playlist_tracks(playlist_id: str, headers: dict, limit: int = 50):
+async def fetch_playlist_tracks(playlist_id: str, headers: dict, limit: int = 50):
     """Fetch tracks from a Spotify playlist"""
     try:
         playlist_url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
@@ -226,7 +238,7 @@ def fetch_playlist_tracks(playlist_id: str, headers: dict, limit: int = 50):
             "fields": "items(track(id,name,artists,album,preview_url,duration_ms,external_urls,popularity))"
         }
         
-        response = requests.get(playlist_url, headers=headers, params=params)
+        response = await spotify_http.get(playlist_url, headers=headers, params=params)
         
         if response.status_code != 200:
             return []
@@ -329,7 +341,7 @@ def filter_tracks_by_vibe(tracks: list, audio_features: dict, event_type: str):
 
 
 @router.get("/suggestions")
-def get_music_suggestions(
+async def get_music_suggestions(
     eventType: Optional[str] = Query(None, description="Event type: mehndi, barat, walima, birthday, corporate"),
     mood: Optional[str] = None,
     genre: Optional[str] = None,
@@ -354,7 +366,7 @@ def get_music_suggestions(
                 "tracks": []
             }
         
-        token = get_spotify_token()
+        token = await get_spotify_token()
         headers = {"Authorization": f"Bearer {token}"}
         
         playlist_tracks = []
@@ -368,7 +380,7 @@ def get_music_suggestions(
             
             # Try each playlist to get tracks
             for playlist_id in playlist_ids:
-                tracks = fetch_playlist_tracks(playlist_id, headers, limit=50)
+                tracks = await fetch_playlist_tracks(playlist_id, headers, limit=50)
                 if tracks:
                     # Filter out tracks with excluded keywords
                     tracks = filter_by_excluded_keywords(tracks, eventType)
@@ -379,7 +391,7 @@ def get_music_suggestions(
             # Apply vibe filtering if we got tracks from playlist
             if playlist_tracks:
                 track_ids = [t["id"] for t in playlist_tracks]
-                audio_features = get_audio_features(track_ids, headers)
+                audio_features = await get_audio_features(track_ids, headers)
                 
                 if audio_features:
                     filtered_tracks = filter_tracks_by_vibe(playlist_tracks, audio_features, eventType)
@@ -439,7 +451,7 @@ def get_music_suggestions(
                 "market": "IN"
             }
             
-            response = requests.get(search_url, headers=headers, params=params)
+            response = await spotify_http.get(search_url, headers=headers, params=params)
             
             if response.status_code == 200:
                 data = response.json()
@@ -529,18 +541,18 @@ def get_music_suggestions(
 
 
 @router.get("/track/{track_id}")
-def get_track_details(track_id: str):
+async def get_track_details(track_id: str):
     """Get detailed information about a specific track"""
     try:
         if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
             raise HTTPException(status_code=500, detail="Spotify API credentials not configured")
         
-        token = get_spotify_token()
+        token = await get_spotify_token()
         headers = {"Authorization": f"Bearer {token}"}
         
         # Get track details
         track_url = f"https://api.spotify.com/v1/tracks/{track_id}"
-        response = requests.get(track_url, headers=headers)
+        response = await spotify_http.get(track_url, headers=headers)
         
         if response.status_code != 200:
             raise HTTPException(status_code=404, detail="Track not found")
@@ -569,13 +581,13 @@ def get_track_details(track_id: str):
 
 
 @router.get("/search")
-def search_music(q: str, limit: int = Query(20, le=50)):
+async def search_music(q: str, limit: int = Query(20, le=50)):
     """Search for tracks on Spotify"""
     try:
         if not SPOTIFY_CLIENT_ID or not SPOTIFY_CLIENT_SECRET:
             return {"success": False, "error": "Spotify API credentials not configured", "data": []}
         
-        token = get_spotify_token()
+        token = await get_spotify_token()
         headers = {"Authorization": f"Bearer {token}"}
         
         # Search Spotify
@@ -587,7 +599,7 @@ def search_music(q: str, limit: int = Query(20, le=50)):
             "market": "IN"  # Indian market for regional relevance
         }
         
-        response = requests.get(search_url, headers=headers, params=params)
+        response = await spotify_http.get(search_url, headers=headers, params=params)
         
         if response.status_code != 200:
             raise HTTPException(status_code=500, detail="Failed to search Spotify")
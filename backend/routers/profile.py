@@ -3,6 +3,7 @@ from pydantic import BaseModel
 from typing import Optional
 from backend.supabase_client import supabase
 from backend.auth import get_current_user
+from backend.routers.equipment import get_photographer_id, invalidate_photographer_id_cache, invalidate_equipment_cache
 
 router = APIRouter(prefix="/profile", tags=["Profile"])
 
@@ -235,8 +236,13 @@ def delete_account(current_user: dict = Depends(get_current_user)):
         # 5. Delete equipment if photographer
         supabase.table('equipment').delete().eq('photographer_id', user_id).execute()
         
-        # 6. Delete photographer profile if exists
+        # 6. Delete photographer profile if exists (its equipment cascades with it)
+        photographer_id = get_photographer_id(user_id)
         supabase.table('photographer_profile').delete().eq('user_id', user_id).execute()
+        invalidate_photographer_id_cache(user_id)
+        if photographer_id:
+            # Drop the deleted listings from the owner/public equipment lists and rentable pages
+            invalidate_equipment_cache(photographer_id)
         
         # 7. Delete user account
         supabase.table('users').delete().eq('id', user_id).execute()
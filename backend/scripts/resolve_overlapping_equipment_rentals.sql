@@ -0,0 +1,43 @@
+-- ============================================
+-- Resolve Overlapping Equipment Rentals
+-- ============================================
+-- Run this in Supabase Dashboard -> SQL Editor when
+-- migrations/add_equipment_rental_overlap_constraint.sql refuses to run.
+-- Step 1 only reads: select and run it on its own first. Step 2 changes user data,
+-- so run it only after reviewing step 1's rows.
+
+-- 1. List open rentals that block the constraint.
+--    Each row is a rental that overlaps an earlier open rental of the same equipment
+--    (or has end_date before start_date, which daterange() rejects).
+SELECT a.id, a.equipment_id, a.status, a.start_date, a.end_date, a.created_at,
+       b.id AS overlaps_rental_id, b.status AS overlaps_status
+FROM equipment_rental a
+LEFT JOIN equipment_rental b
+  ON b.equipment_id = a.equipment_id
+ AND b.status IN ('requested', 'approved', 'active')
+ AND b.start_date <= a.end_date
+ AND b.end_date >= a.start_date
+ AND (b.created_at, b.id) < (a.created_at, a.id)
+WHERE a.status IN ('requested', 'approved', 'active')
+  AND (b.id IS NOT NULL OR a.end_date < a.start_date)
+ORDER BY a.equipment_id, a.start_date;
+
+-- 2. Cancel offending rows that are still only requests (the owner never accepted them).
+--    Review step 1's output first. Overlapping approved/active rentals are left alone:
+--    resolve those by hand with the owners, then re-run step 1 until it returns no rows.
+UPDATE equipment_rental a
+SET status = 'cancelled',
+    notes = concat_ws(E'\n', a.notes, 'Cancelled: overlapped an earlier rental of the same equipment')
+WHERE a.status = 'requested'
+  AND (
+    a.end_date < a.start_date
+    OR EXISTS (
+        SELECT 1
+        FROM equipment_rental b
+        WHERE b.equipment_id = a.equipment_id
+          AND b.status IN ('requested', 'approved', 'active')
+          AND b.start_date <= a.end_date
+          AND b.end_date >= a.start_date
+          AND (b.created_at, b.id) < (a.created_at, a.id)
+    )
+  );
@@ -0,0 +1,172 @@
+"""
+Response Cache Service
+Short-lived cache for expensive, frequently polled API responses
+
+Uses Redis when REDIS_URL is set (shared across workers),
+otherwise falls back to an in-memory store (single process).
+Cache failures never break a request - a miss is returned instead.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    redis = None
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+REDIS_URL = os.getenv("REDIS_URL", "")
+MAX_MEMORY_KEYS = 10000  # Purge expired entries once the in-memory store grows past this
+# Namespace versions outlive any cached value (longest data TTL is 600s) and are refreshed
+# on every read, so a version only lapses once nothing built from it can still be cached
+VERSION_TTL = 3600
+# After a Redis connection/timeout error, treat the cache as a miss for this long instead
+# of paying the socket timeout on every call
+REDIS_RETRY_AFTER = 30
+
+
+class ResponseCache:
+    """
+    Key/value cache with per-key TTL
+
+    Values are serialized with orjson so the Redis and in-memory
+    backends behave the same (callers always get a fresh copy).
+    """
+
+    def __init__(self, redis_url: str = ""):
+        self._redis = None
+        # In-memory store: {key: (expires_at, serialized_value)}
+        self._store: Dict[str, Tuple[float, bytes]] = {}
+        # In-memory namespace versions: {name: (expires_at, version)}
+        self._versions: Dict[str, Tuple[float, int]] = {}
+        # Redis is skipped until this time after a connection failure
+        self._redis_retry_at = 0.0
+
+        if redis_url and REDIS_AVAILABLE:
+            try:
+                self._redis = redis.Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                logger.info("✅ ResponseCache initialized (redis mode)")
+            except Exception as e:
+                logger.warning(f"Redis unavailable, using in-memory cache: {e}")
+                self._redis = None
+        else:
+            logger.info("✅ ResponseCache initialized (in-memory mode)")
+
+    @property
+    def is_shared(self) -> bool:
+        """True when backed by Redis (visible to every worker and survives restarts)"""
+        return self._redis is not None
+
+    def _redis_down(self) -> bool:
+        """True while backing off after a Redis connection failure"""
+        return time.monotonic() < self._redis_retry_at
+
+    def _failed(self, action: str, target: Any, e: Exception) -> None:
+        """Log a cache failure; connection problems also start the Redis backoff"""
+        if REDIS_AVAILABLE and isinstance(e, (redis.ConnectionError, redis.TimeoutError)):
+            self._redis_retry_at = time.monotonic() + REDIS_RETRY_AFTER
+            logger.warning(f"Redis unreachable, skipping cache for {REDIS_RETRY_AFTER}s: {e}")
+        else:
+            logger.warning(f"Cache {action} failed for {target}: {e}")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for key, or None on miss/error"""
+        try:
+            if self._redis is not None:
+                if self._redis_down():
+                    return None
+                raw = self._redis.get(key)
+            else:
+                entry = self._store.get(key)
+                raw = None
+                if entry:
+                    if entry[0] > time.monotonic():
+                        raw = entry[1]
+                    else:
+                        self._store.pop(key, None)
+            return orjson.loads(raw) if raw else None
+        except Exception as e:
+            self._failed("get", key, e)
+            return None
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        """Cache value under key for ttl seconds"""
+        try:
+            raw = orjson.dumps(value, default=str)
+            if self._redis is not None:
+                if not self._redis_down():
+                    self._redis.setex(key, ttl, raw)
+            else:
+                now = time.monotonic()
+                if len(self._store) >= MAX_MEMORY_KEYS:
+                    self._store = {k: v for k, v in self._store.items() if v[0] > now}
+                self._store[key] = (now + ttl, raw)
+        except Exception as e:
+            self._failed("set", key, e)
+
+    def delete(self, *keys: str) -> None:
+        """Invalidate one or more keys"""
+        if not keys:
+            return
+        try:
+            if self._redis is not None:
+                if not self._redis_down():
+                    self._redis.delete(*keys)
+            else:
+                for key in keys:
+                    self._store.pop(key, None)
+        except Exception as e:
+            self._failed("delete", keys, e)
+
+    def get_version(self, name: str) -> int:
+        """
+        Current version of a key namespace (0 if never bumped or lapsed)
+
+        Callers embed it in their keys so bump_version() retires a whole
+        family of entries at once; the old entries simply expire.
+        """
+        try:
+            if self._redis is not None:
+                if self._redis_down():
+                    return 0
+                key = f"ver:{name}"
+                raw, _ = self._redis.pipeline(transaction=False).get(key).expire(key, VERSION_TTL).execute()
+                return int(raw) if raw else 0
+            now = time.monotonic()
+            entry = self._versions.get(name)
+            if not entry or entry[0] <= now:
+                return 0
+            self._versions[name] = (now + VERSION_TTL, entry[1])
+            return entry[1]
+        except Exception as e:
+            self._failed("version get", name, e)
+            return 0
+
+    def bump_version(self, name: str) -> None:
+        """Atomically advance a namespace version, invalidating every key built from the old one"""
+        try:
+            if self._redis is not None:
+                if not self._redis_down():
+                    key = f"ver:{name}"
+                    self._redis.pipeline(transaction=False).incr(key).expire(key, VERSION_TTL).execute()
+            else:
+                now = time.monotonic()
+                if len(self._versions) >= MAX_MEMORY_KEYS:
+                    self._versions = {k: v for k, v in self._versions.items() if v[0] > now}
+                entry = self._versions.get(name)
+                version = entry[1] if entry and entry[0] > now else 0
+                self._versions[name] = (now + VERSION_TTL, version + 1)
+        except Exception as e:
+            self._failed("version bump", name, e)
+
+
+# Global singleton instance
+response_cache = ResponseCache(REDIS_URL)
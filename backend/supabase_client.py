@@ -1,4 +1,6 @@
 from supabase import create_client
+from supabase.lib.client_options import ClientOptions
+import httpx
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -13,6 +15,35 @@ else:
 
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+POSTGREST_TIMEOUT = 10  # Seconds per PostgREST request
+# Per-process cap on open PostgREST connections (Supabase pools the Postgres side itself)
+SUPABASE_MAX_CONNECTIONS = int(os.getenv("SUPABASE_MAX_CONNECTIONS", "50"))
+
+
+def _tune_postgrest_session(client) -> None:
+	"""Swap the PostgREST session for one with long-lived keep-alive (HTTP/2 when h2 is installed)"""
+	try:
+		old = client.postgrest.session
+		options = dict(
+			base_url=old.base_url,
+			headers=old.headers,
+			timeout=old.timeout,
+			follow_redirects=True,
+			limits=httpx.Limits(
+				max_keepalive_connections=min(20, SUPABASE_MAX_CONNECTIONS),
+				max_connections=SUPABASE_MAX_CONNECTIONS,
+				keepalive_expiry=60
+			)
+		)
+		try:
+			session = type(old)(http2=True, **options)
+		except ImportError:
+			print("⚠️  h2 not installed - Supabase client falling back to HTTP/1.1")
+			session = type(old)(**options)
+		client.postgrest.session = session
+		old.close()
+	except Exception as e:
+		print(f"⚠️  Could not tune Supabase HTTP session, using defaults: {e}")
 
 
 # Use SERVICE ROLE KEY — bypasses RLS for backend operations
@@ -80,4 +111,10 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
 
 	supabase = _DummySupabase()
 else:
-	supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+	supabase = create_client(
+		SUPABASE_URL,
+		SUPABASE_SERVICE_ROLE_KEY,
+		options=ClientOptions(postgrest_client_timeout=POSTGREST_TIMEOUT)
+	)
+	# One long-lived client for the whole process; reuse its TCP/TLS connections across requests
+	_tune_postgrest_session(supabase)